@@ -36,13 +36,40 @@ class Settings(BaseSettings):
     DATABASE_NAME: str = "vibe_chat"  # MySQL 数据库名称
     DATABASE_PATH: str = "vibe_chat.db"  # SQLite 数据库文件路径
     
+    # 话术检索配置
+    SCRIPT_SEARCH_BACKEND: str = "memory"  # 关键词检索后端：memory-内存倒排索引，fts5-SQLite全文检索，like-LIKE模糊匹配
+    SEARCH_ID_IN_LIMIT: int = 500  # 内存索引命中数不超过该值时以 id IN (...) 下推到SQL，超过时在内存中过滤候选
+    SEARCH_USAGE_WEIGHT: float = 0.3  # 排序时使用次数的权重，综合得分 = BM25相关度 + 权重 * ln(1 + 使用次数)
+    SCRIPT_COUNT_CACHE_TTL: int = 60  # 话术列表总数缓存时间（秒），total_mode=cached 时使用
+    SEARCH_CACHE_SIZE: int = 2048  # 检索结果缓存的最大条目数
+    SEARCH_CACHE_TTL: int = 300  # 检索结果缓存时间（秒），话术内容变更时立即失效
+    SUGGEST_TOP_K: int = 10  # 输入联想每个前缀缓存并可返回的最大词条数
+    CHAT_CACHE_SIZE: int = 4096  # 聊天回复缓存的最大条目数
+    CHAT_CACHE_TTL: int = 300  # 聊天回复缓存时间（秒），话术内容变更时立即失效
+    AUTH_CACHE_SIZE: int = 10000  # 认证缓存的最大令牌数和用户数
+    AUTH_CACHE_TTL: int = 300  # 认证缓存时间（秒），用户信息修改时立即失效，其他途径修改最多延迟该时间生效
+    PASSWORD_HASH_WORKERS: int = 2  # 密码哈希线程数，限制登录高峰占用的CPU
+    PASSWORD_HASH_MAX_PENDING: int = 32  # 执行中和排队的密码哈希任务上限，超过时返回503
+    
     # CORS 跨域配置
     CORS_ORIGINS: Union[str, List[str]] = ["http://localhost:5173", "http://localhost:8080", "http://127.0.0.1:5173"]  # 允许跨域的源列表
     
     # AI 聊天配置
     MAX_CONTEXT_TURNS: int = 10  # 最大上下文轮次
+    SESSION_CONTEXT_SIZE: int = 10000  # 内存中缓存上下文的最大会话数
+    SESSION_CONTEXT_TTL: int = 1800  # 会话上下文缓存时间（秒），会话有新消息时重新计时
     RESPONSE_TIMEOUT: int = 2  # 响应超时时间（秒）
     
+    # 对话记录写入配置
+    CONVERSATION_LOG_BATCH_SIZE: int = 100  # 对话记录批量写入的最大条数
+    CONVERSATION_LOG_FLUSH_INTERVAL: float = 1.0  # 对话记录最长缓冲时间（秒），到时不足一批也会写入
+    CONVERSATION_LOG_MAX_PENDING: int = 10000  # 内存中待写入对话记录的上限
+    CONVERSATION_LOG_OVERFLOW: str = "block"  # 待写入记录达到上限时的策略：block-等待写入腾出空间，drop-丢弃新记录
+    CONVERSATION_LOG_MAX_RETRIES: int = 3  # 对话记录批量写入失败（如数据库被锁）后的最大重试次数，耗尽后丢弃该批
+    SCRIPT_COUNTER_FLUSH_INTERVAL: float = 5.0  # 话术使用次数、点赞数增量的批量写入间隔（秒）
+    SCRIPT_LIKE_CACHE_SIZE: int = 10000  # 点赞去重位图最多缓存的用户数
+    SCRIPT_LIKE_CACHE_TTL: int = 3600  # 点赞去重位图的缓存时间（秒）
+    
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
@@ -64,6 +91,20 @@ class Settings(BaseSettings):
             return f"sqlite:///{db_path}"
         return f"mysql+pymysql://{self.DATABASE_USER}:{self.DATABASE_PASSWORD}@{self.DATABASE_HOST}:{self.DATABASE_PORT}/{self.DATABASE_NAME}?charset=utf8mb4"
     
+    @property
+    def ASYNC_DATABASE_URL(self) -> str:
+        """
+        生成异步数据库连接 URL
+        
+        与 DATABASE_URL 指向同一个数据库，驱动换成异步版本：
+        - sqlite: aiosqlite
+        - mysql: aiomysql
+        """
+        if self.DATABASE_TYPE == "sqlite":
+            db_path = os.path.abspath(self.DATABASE_PATH)
+            return f"sqlite+aiosqlite:///{db_path}"
+        return f"mysql+aiomysql://{self.DATABASE_USER}:{self.DATABASE_PASSWORD}@{self.DATABASE_HOST}:{self.DATABASE_PORT}/{self.DATABASE_NAME}?charset=utf8mb4"
+    
     def get_cors_origins(self) -> List[str]:
         """
         获取 CORS 允许的源列表
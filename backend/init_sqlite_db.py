@@ -1,5 +1,7 @@
 import sqlite3
 from datetime import datetime
+from config import get_settings
+from models.script_fts import create_script_fts
 
 def init_sqlite_db():
     conn = sqlite3.connect('vibe_chat.db')
@@ -73,6 +75,56 @@ def init_sqlite_db():
         )
     ''')
     
+    # 话术全文检索表，触发器保证后续补充脚本写入的数据自动同步；
+    # 只在使用 fts5 检索后端时创建，否则每次写 scripts 都要维护用不到的索引
+    if get_settings().SCRIPT_SEARCH_BACKEND == 'fts5':
+        try:
+            create_script_fts(cursor.execute)
+        except sqlite3.OperationalError as e:
+            print(f'当前SQLite不支持FTS5全文检索，已跳过: {e}')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tags (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            created_at TEXT DEFAULT (datetime('now'))
+        )
+    ''')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS script_tags (
+            script_id INTEGER NOT NULL,
+            tag_id INTEGER NOT NULL,
+            PRIMARY KEY (script_id, tag_id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tag_script ON script_tags (tag_id, script_id)')
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS script_variants (
+            script_id INTEGER NOT NULL,
+            tone TEXT NOT NULL,
+            length_type TEXT NOT NULL,
+            original_content TEXT NOT NULL,
+            adjusted_content TEXT NOT NULL,
+            updated_at TEXT DEFAULT (datetime('now')),
+            PRIMARY KEY (script_id, tone, length_type)
+        )
+    ''')
+    # 直接写库修改话术内容或删除话术时删除其变体，应用读取时退回现场调整，启动时补齐
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS scripts_variants_au AFTER UPDATE OF content, brief_content ON scripts
+        WHEN old.content IS NOT new.content OR old.brief_content IS NOT new.brief_content
+        BEGIN
+            DELETE FROM script_variants WHERE script_id = old.id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS scripts_variants_ad AFTER DELETE ON scripts BEGIN
+            DELETE FROM script_variants WHERE script_id = old.id;
+        END
+    ''')
+    
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS user_favorites (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -84,6 +136,15 @@ def init_sqlite_db():
         )
     ''')
     
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS script_likes (
+            user_id INTEGER NOT NULL,
+            script_id INTEGER NOT NULL,
+            created_at TEXT DEFAULT (datetime('now')),
+            PRIMARY KEY (user_id, script_id)
+        )
+    ''')
+    
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS conversations (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -219,7 +280,7 @@ def init_sqlite_db():
     print(f'  用户名: admin')
     print(f'  密码: {password}')
     print(f'数据库名称: vibe_chat.db')
-    print(f'已创建表: users, positions, script_categories, scripts, user_favorites, conversations, script_adjustments, system_configs')
+    print(f'已创建表: users, positions, script_categories, scripts, tags, script_tags, script_variants, user_favorites, script_likes, conversations, script_adjustments, system_configs')
     print(f'已插入初始数据: {len(positions)}个岗位, {len(categories)}个分类, {len(scripts)}条话术, {len(configs)}个配置')
     
     conn.close()
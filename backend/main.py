@@ -2,6 +2,15 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from config import get_settings
 from routers import auth, scripts, chat, system
+from models.database import Base, SessionLocal, ScriptLike, ScriptTag, ScriptVariant, Tag, async_engine, engine
+from services.search_index import script_index, init_script_fts, drop_script_fts_if_unused
+from services.facets import script_facets
+from services.suggest import script_suggester
+from services.script_tags import sync_missing_script_tags
+from services.script_variants import create_script_variant_triggers, sync_missing_script_variants
+from services.conversation_log import conversation_log
+from services.script_counters import script_counters
+from utils.auth import password_pool
 
 # 获取应用配置
 settings = get_settings()
@@ -26,6 +35,7 @@ app.add_middleware(
 app.include_router(auth.router)    # 认证相关路由
 app.include_router(scripts.router) # 话术脚本路由
 app.include_router(chat.router)    # 聊天相关路由
+app.include_router(chat.ws_router) # 聊天 WebSocket 路由
 app.include_router(system.router)  # 系统相关路由
 
 
@@ -46,12 +56,50 @@ async def root():
 async def startup_event():
     """
     应用启动事件
-    打印启动信息和文档地址
+    补齐话术标签关联和语气长度变体，构建话术检索索引、分面索引和输入联想索引，打印启动信息和文档地址
     """
+    Base.metadata.create_all(bind=engine, tables=[Tag.__table__, ScriptTag.__table__, ScriptVariant.__table__, ScriptLike.__table__])
+    with engine.begin() as connection:
+        synced = sync_missing_script_tags(connection)
+        create_script_variant_triggers(connection)
+        rendered = sync_missing_script_variants(connection)
+    if synced:
+        print(f"已补齐 {synced} 条话术的标签关联")
+    if rendered:
+        print(f"已生成 {rendered} 条话术的语气和长度变体")
+    
+    if settings.SCRIPT_SEARCH_BACKEND == "fts5":
+        if init_script_fts(engine):
+            print("FTS5 全文检索已启用")
+    elif drop_script_fts_if_unused(engine):
+        print("检索后端不是 fts5，已删除 FTS5 全文检索表及触发器")
+    
+    db = SessionLocal()
+    try:
+        count = script_index.build(db)
+        script_facets.build(db)
+        script_suggester.build(db)
+    finally:
+        db.close()
+    print(f"话术检索索引构建完成，共 {count} 条话术")
+    conversation_log.start()
+    script_counters.start()
     print(f"{settings.APP_NAME} 启动成功！")
     print(f"API文档地址: http://localhost:8000/docs")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """
+    应用关闭事件
+    把队列中的对话记录和话术计数增量全部写入数据库，释放异步数据库连接池和密码哈希线程池
+    """
+    await conversation_log.stop()
+    await script_counters.stop()
+    await async_engine.dispose()
+    password_pool.shutdown()
+
+
 if __name__ == "__main__":
     import uvicorn
     # 运行开发服务器
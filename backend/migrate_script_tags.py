@@ -0,0 +1,26 @@
+"""
+话术标签迁移脚本
+
+创建 tags / script_tags 表，并按 scripts.tags 字段重建话术与标签的关联。
+可重复执行；直接修改数据库中话术的 tags 字段后也应执行一次。
+
+用法：
+    python migrate_script_tags.py
+"""
+
+from sqlalchemy import func, select
+
+from models.database import Base, ScriptTag, Tag, engine
+from services.script_tags import rebuild_script_tags
+
+
+def migrate_script_tags():
+    Base.metadata.create_all(bind=engine, tables=[Tag.__table__, ScriptTag.__table__])
+    with engine.begin() as connection:
+        count = rebuild_script_tags(connection)
+        tag_count = connection.execute(select(func.count()).select_from(Tag.__table__)).scalar()
+    print(f'话术标签迁移完成：{count} 条话术，{tag_count} 个标签')
+
+
+if __name__ == '__main__':
+    migrate_script_tags()
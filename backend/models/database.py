@@ -8,6 +8,8 @@
 - Position: 岗位表模型，存储研发团队不同岗位的信息
 - ScriptCategory: 话术分类表模型，存储话术的分类信息，支持层级结构
 - Script: 话术表模型，存储高情商沟通话术的核心数据
+- Tag: 标签表模型，存储规范化后的话术标签
+- ScriptTag: 话术标签关联表模型，存储话术与标签的多对多关系
 - UserFavorite: 用户收藏表模型，存储用户收藏的话术记录
 - Conversation: 对话记录表模型，存储用户与AI助手的对话历史
 - ScriptAdjustment: 话术调整记录表模型，存储用户调整话术的历史记录
@@ -18,11 +20,13 @@
 - config: 配置模块，用于获取数据库连接配置
 
 函数：
-- get_db(): 数据库会话依赖注入函数，用于FastAPI路由中获取数据库会话
+- get_db(): 同步数据库会话依赖注入函数，供命令行脚本和同步代码使用
+- get_async_db(): 异步数据库会话依赖注入函数，FastAPI路由使用，查询不阻塞事件循环
 """
 
 from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Boolean, BigInteger, ForeignKey, Index, JSON
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
 from config import get_settings
@@ -32,6 +36,10 @@ settings = get_settings()
 engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True, pool_recycle=3600)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 异步引擎：路由通过 AsyncSession 访问数据库，提交后不过期对象，响应序列化时无需再次加载
+async_engine = create_async_engine(settings.ASYNC_DATABASE_URL, pool_pre_ping=True, pool_recycle=3600)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 
@@ -167,6 +175,49 @@ class Script(Base):
     )
 
 
+class Tag(Base):
+    """标签表模型 - 存储规范化后的话术标签"""
+    __tablename__ = "tags"
+    
+    # 基础字段
+    id = Column(Integer, primary_key=True, autoincrement=True, comment="标签ID，主键自增")
+    name = Column(String(50), nullable=False, unique=True, comment="标签名称，全局唯一")
+    
+    # 时间戳
+    created_at = Column(DateTime, default=datetime.now, comment="标签创建时间")
+
+
+class ScriptTag(Base):
+    """话术标签关联表模型 - 由 scripts.tags 拆分同步，按标签筛选时走索引查找"""
+    __tablename__ = "script_tags"
+    
+    # 联合主键
+    script_id = Column(BigInteger, primary_key=True, comment="话术ID，关联scripts表")
+    tag_id = Column(Integer, primary_key=True, comment="标签ID，关联tags表")
+    
+    # 索引定义
+    __table_args__ = (
+        Index('idx_tag_script', 'tag_id', 'script_id'),
+    )
+
+
+class ScriptVariant(Base):
+    """话术变体表模型 - 预先生成每条话术在各语气、长度下的调整结果，调整话术时直接查表"""
+    __tablename__ = "script_variants"
+    
+    # 联合主键
+    script_id = Column(BigInteger, primary_key=True, comment="话术ID，关联scripts表")
+    tone = Column(String(20), primary_key=True, comment="语气，空字符串表示不调整语气")
+    length_type = Column(String(20), primary_key=True, comment="长度类型：简洁版、标准版、详细版")
+    
+    # 内容字段
+    original_content = Column(Text, nullable=False, comment="调整前的话术内容，简洁版优先使用brief_content")
+    adjusted_content = Column(Text, nullable=False, comment="调整后的话术内容")
+    
+    # 时间戳
+    updated_at = Column(DateTime, default=datetime.now, comment="变体生成时间")
+
+
 class UserFavorite(Base):
     """用户收藏表模型 - 存储用户收藏的话术记录"""
     __tablename__ = "user_favorites"
@@ -190,6 +241,18 @@ class UserFavorite(Base):
     )
 
 
+class ScriptLike(Base):
+    """话术点赞表模型 - 每个用户对每条话术只能点赞一次"""
+    __tablename__ = "script_likes"
+    
+    # 联合主键
+    user_id = Column(BigInteger, primary_key=True, comment="用户ID，关联users表")
+    script_id = Column(BigInteger, primary_key=True, comment="话术ID，关联scripts表")
+    
+    # 时间戳
+    created_at = Column(DateTime, default=datetime.now, comment="点赞时间")
+
+
 class Conversation(Base):
     """对话记录表模型 - 存储用户与AI助手的对话历史"""
     __tablename__ = "conversations"
@@ -284,3 +347,24 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """
+    异步数据库会话依赖注入函数
+    
+    路由处理函数均为 async def，使用 AsyncSession 执行查询可以避免同步驱动阻塞事件循环。
+    同一请求中多个依赖声明 get_async_db 时，FastAPI 只创建一个会话。
+    需要调用同步服务代码时，使用 await db.run_sync(lambda session: ...) 在同一连接上执行。
+    
+    Yields:
+        AsyncSession: SQLAlchemy异步数据库会话对象
+        
+    Example:
+        @app.get("/users")
+        async def get_users(db: AsyncSession = Depends(get_async_db)):
+            result = await db.execute(select(User))
+            return result.scalars().all()
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
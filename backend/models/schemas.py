@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List
+from typing import Any, Optional, List, Dict, Union
 from datetime import datetime
 
 
@@ -39,6 +39,20 @@ class UserResponse(UserBase):
         from_attributes = True
 
 
+class UserSnapshot(BaseModel):
+    """认证缓存中的用户快照，只包含鉴权和对话需要的字段"""
+    id: int
+    username: str
+    role: Optional[str] = None
+    is_active: bool
+    is_vip: bool = False
+    vip_expire_time: Optional[datetime] = None
+    tone_preference: Optional[str] = None
+    length_preference: Optional[str] = None
+    
+    model_config = {"from_attributes": True, "frozen": True}
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
@@ -113,6 +127,7 @@ class ScriptDetail(ScriptResponse):
     category: Optional[CategoryResponse] = None
     position: Optional[PositionResponse] = None
     is_favorite: bool = False
+    is_liked: bool = False
 
 
 class UserFavoriteBase(BaseModel):
@@ -134,6 +149,12 @@ class UserFavoriteResponse(UserFavoriteBase):
         from_attributes = True
 
 
+class FavoriteListResponse(BaseModel):
+    # 按 fields 参数投影后的收藏记录，字段同 UserFavoriteResponse
+    favorites: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
+
+
 class ConversationBase(BaseModel):
     session_id: str
     message_type: str
@@ -183,6 +204,16 @@ class ScriptAdjustResponse(BaseModel):
     length_type: Optional[str] = None
 
 
+class ScriptAdjustBatchRequest(BaseModel):
+    script_ids: List[int] = Field(..., min_length=1, max_length=100)
+    tone: Optional[str] = None
+    length_type: Optional[str] = None
+
+
+class ScriptAdjustBatchItem(ScriptAdjustResponse):
+    script_id: int
+
+
 class SearchRequest(BaseModel):
     keyword: str
     position_id: Optional[int] = None
@@ -193,12 +224,31 @@ class SearchRequest(BaseModel):
     page_size: int = 10
 
 
+class FacetCount(BaseModel):
+    value: Optional[Union[bool, int, str]] = None
+    count: int
+
+
+class SuggestItem(BaseModel):
+    text: str
+    kind: str
+    script_id: int
+    usage_count: int
+
+
+class SuggestResponse(BaseModel):
+    query: str
+    suggestions: List[SuggestItem]
+
+
 class SearchResponse(BaseModel):
     scripts: List[ScriptResponse]
     total: int
     page: int
     page_size: int
     total_pages: int
+    next_cursor: Optional[str] = None
+    facets: Optional[Dict[str, List[FacetCount]]] = None
 
 
 class HealthResponse(BaseModel):
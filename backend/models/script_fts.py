@@ -0,0 +1,76 @@
+"""
+话术全文检索表模块（SQLite FTS5）
+
+定义与 scripts 表同步的 FTS5 外部内容虚拟表 scripts_fts 及其维护触发器。
+使用 trigram 分词器，中文子串同样可以命中；插入、更新、删除触发器在数据库层面
+保持索引同步，因此 supplement_knowledge_base*.py 等直接通过 sqlite3 写库的脚本
+也会自动更新索引。
+
+本模块不依赖应用配置，可同时被应用（SQLAlchemy 连接）和 init_sqlite_db.py
+（sqlite3 游标）使用。
+"""
+
+SCRIPT_FTS_TABLE = "scripts_fts"
+
+# 参与全文检索的列，顺序与虚拟表定义一致
+SCRIPT_FTS_COLUMNS = ("title", "content", "tags", "brief_content")
+
+_COLUMNS = ", ".join(SCRIPT_FTS_COLUMNS)
+_NEW_VALUES = ", ".join(f"new.{c}" for c in SCRIPT_FTS_COLUMNS)
+_OLD_VALUES = ", ".join(f"old.{c}" for c in SCRIPT_FTS_COLUMNS)
+
+SCRIPT_FTS_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SCRIPT_FTS_TABLE} USING fts5(
+        {_COLUMNS},
+        content='scripts', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS scripts_fts_ai AFTER INSERT ON scripts BEGIN
+        INSERT INTO {SCRIPT_FTS_TABLE}(rowid, {_COLUMNS}) VALUES (new.id, {_NEW_VALUES});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS scripts_fts_ad AFTER DELETE ON scripts BEGIN
+        INSERT INTO {SCRIPT_FTS_TABLE}({SCRIPT_FTS_TABLE}, rowid, {_COLUMNS}) VALUES ('delete', old.id, {_OLD_VALUES});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS scripts_fts_au AFTER UPDATE OF {_COLUMNS} ON scripts BEGIN
+        INSERT INTO {SCRIPT_FTS_TABLE}({SCRIPT_FTS_TABLE}, rowid, {_COLUMNS}) VALUES ('delete', old.id, {_OLD_VALUES});
+        INSERT INTO {SCRIPT_FTS_TABLE}(rowid, {_COLUMNS}) VALUES (new.id, {_NEW_VALUES});
+    END
+    """,
+]
+
+# 删除全文检索表和触发器，不使用 fts5 检索后端时避免每次写 scripts 都维护索引
+SCRIPT_FTS_DROP = [
+    "DROP TRIGGER IF EXISTS scripts_fts_ai",
+    "DROP TRIGGER IF EXISTS scripts_fts_ad",
+    "DROP TRIGGER IF EXISTS scripts_fts_au",
+    f"DROP TABLE IF EXISTS {SCRIPT_FTS_TABLE}",
+]
+
+# 从 scripts 表重建全文索引，用于首次创建或索引损坏时
+SCRIPT_FTS_REBUILD = f"INSERT INTO {SCRIPT_FTS_TABLE}({SCRIPT_FTS_TABLE}) VALUES ('rebuild')"
+
+
+def create_script_fts(execute, exists: bool = False):
+    """
+    创建全文检索表和触发器
+
+    Args:
+        execute: 执行单条SQL的函数，如 sqlite3 的 cursor.execute
+        exists: 虚拟表是否已经存在；不存在时创建后会从 scripts 表重建索引
+    """
+    for ddl in SCRIPT_FTS_DDL:
+        execute(ddl)
+    if not exists:
+        execute(SCRIPT_FTS_REBUILD)
+
+
+def drop_script_fts(execute):
+    """删除全文检索表和触发器，参数同 create_script_fts()"""
+    for ddl in SCRIPT_FTS_DROP:
+        execute(ddl)
@@ -0,0 +1,28 @@
+"""
+话术变体重建脚本
+
+创建 script_variants 表及失效触发器，并按话术当前内容重新生成全部语气、长度组合的调整结果。
+可重复执行；调整语气、长度规则后应执行一次。直接修改数据库中话术内容时，
+SQLite 触发器会删除其变体，应用启动时自动补齐，无需执行本脚本。
+
+用法：
+    python rebuild_script_variants.py
+"""
+
+from sqlalchemy import func, select
+
+from models.database import Base, ScriptVariant, engine
+from services.script_variants import create_script_variant_triggers, rebuild_script_variants
+
+
+def main():
+    Base.metadata.create_all(bind=engine, tables=[ScriptVariant.__table__])
+    with engine.begin() as connection:
+        create_script_variant_triggers(connection)
+        count = rebuild_script_variants(connection)
+        variant_count = connection.execute(select(func.count()).select_from(ScriptVariant.__table__)).scalar()
+    print(f'话术变体重建完成：{count} 条话术，{variant_count} 条变体')
+
+
+if __name__ == '__main__':
+    main()
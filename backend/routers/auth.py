@@ -2,18 +2,20 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 # 导入数据库会话管理
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 # 导入时间相关模块
 from datetime import timedelta
 # 导入数据库模型和工具函数
-from models.database import get_db, User
-from models.schemas import UserCreate, UserResponse, Token
+from models.database import get_async_db, User
+from models.schemas import UserCreate, UserResponse, UserSnapshot, Token
 # 导入认证相关工具函数
 from utils.auth import (
-    get_password_hash,
-    verify_password,
+    get_password_hash_async,
+    verify_password_async,
     create_access_token,
-    get_current_active_user
+    get_current_active_user,
+    invalidate_user
 )
 # 导入配置
 from config import get_settings
@@ -25,7 +27,7 @@ router = APIRouter(prefix="/api/auth", tags=["认证"])
 
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """
     用户注册接口
     
@@ -45,7 +47,7 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
         print(f"User data: {user}")
         
         # 检查用户名是否已存在
-        db_user = db.query(User).filter(User.username == user.username).first()
+        db_user = (await db.execute(select(User).where(User.username == user.username))).scalars().first()
         if db_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -54,15 +56,15 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
         
         # 检查手机号是否已被注册
         if user.phone:
-            phone_user = db.query(User).filter(User.phone == user.phone).first()
+            phone_user = (await db.execute(select(User).where(User.phone == user.phone))).scalars().first()
             if phone_user:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="手机号已被注册"
                 )
         
-        # 对密码进行哈希加密
-        hashed_password = get_password_hash(user.password)
+        # 对密码进行哈希加密（在密码哈希线程池中执行）
+        hashed_password = await get_password_hash_async(user.password)
         print(f"Password hashed successfully")
         
         # 创建用户对象
@@ -81,9 +83,9 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
         print(f"Creating user object: {db_user}")
         db.add(db_user)
         print(f"User added to session")
-        db.commit()
+        await db.commit()
         print(f"User committed to database")
-        db.refresh(db_user)
+        await db.refresh(db_user)
         print(f"User refreshed: {db_user.id}")
         
         return db_user
@@ -104,7 +106,7 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
 @router.post("/login", response_model=Token)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     用户登录接口
@@ -120,10 +122,10 @@ async def login(
         HTTPException: 用户名或密码错误、用户已被禁用
     """
     # 根据用户名查询用户
-    user = db.query(User).filter(User.username == form_data.username).first()
+    user = (await db.execute(select(User).where(User.username == form_data.username))).scalars().first()
     
-    # 验证用户是否存在以及密码是否正确
-    if not user or not verify_password(form_data.password, user.password_hash):
+    # 验证用户是否存在以及密码是否正确（在密码哈希线程池中执行）
+    if not user or not await verify_password_async(form_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="用户名或密码错误",
@@ -155,45 +157,54 @@ async def login(
 
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(
-    current_user: User = Depends(get_current_active_user)
+    current_user: UserSnapshot = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取当前登录用户信息接口
     
+    认证依赖只提供用户快照，这里按ID加载完整的用户信息
+    
     Args:
-        current_user: 当前激活的用户（通过JWT令牌自动获取）
+        current_user: 当前激活的用户快照（通过JWT令牌自动获取）
+        db: 数据库会话
     
     Returns:
         UserResponse: 当前用户信息
     """
-    return current_user
+    return await db.get(User, current_user.id)
 
 
 @router.put("/me", response_model=UserResponse)
 async def update_current_user(
     user_update: dict,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: UserSnapshot = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     更新当前用户信息接口
     
+    更新后使该用户的认证缓存失效，后续请求立即使用新的偏好设置
+    
     Args:
         user_update: 需要更新的用户信息字典
-        current_user: 当前激活的用户（通过JWT令牌自动获取）
+        current_user: 当前激活的用户快照（通过JWT令牌自动获取）
         db: 数据库会话
     
     Returns:
         UserResponse: 更新后的用户信息
     """
+    user = await db.get(User, current_user.id)
+    
     # 遍历更新字段
     for field, value in user_update.items():
         # 检查字段是否存在且值不为空
-        if hasattr(current_user, field) and value is not None:
-            setattr(current_user, field, value)
+        if hasattr(user, field) and value is not None:
+            setattr(user, field, value)
     
     # 提交更改到数据库
-    db.commit()
+    await db.commit()
     # 刷新用户对象以获取最新数据
-    db.refresh(current_user)
-    return current_user
+    await db.refresh(user)
+    invalidate_user(current_user.username, user.username)
+    return user
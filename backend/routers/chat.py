@@ -1,92 +1,324 @@
 # 导入FastAPI相关组件
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, BackgroundTasks, Depends, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 # 导入SQLAlchemy会话类型
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 # 导入可选类型
-from typing import Optional
+from typing import AsyncIterator, List, Optional, Tuple
+from collections import deque
+import json
 # 导入UUID生成模块
 import uuid
-# 导入数据库相关模块和用户模型
-from models.database import get_db, User
+from datetime import datetime
+# 导入数据库相关模块
+from models.database import AsyncSessionLocal, get_async_db
 # 导入请求和响应的数据模型
-from models.schemas import ChatRequest, ChatResponse, ScriptAdjustResponse, ScriptAdjustRequest
+from models.schemas import ChatRequest, ChatResponse, ScriptAdjustResponse, ScriptAdjustRequest, ScriptAdjustBatchRequest, ScriptAdjustBatchItem, UserSnapshot
 # 导入增强的AI服务
-from services.ai_service_enhanced import EnhancedAIService
+from services.ai_service_enhanced import EnhancedAIService, MessageAnalysis
+# 导入对话记录写入队列和会话上下文
+from services.conversation_log import conversation_log
+from services.session_context import context_entry, session_context
 # 导入认证工具
-from utils.auth import get_current_active_user
+from utils.auth import get_current_active_user, load_user_snapshot, verify_token
 
 # 创建API路由器，设置前缀和标签
 router = APIRouter(prefix="/api/chat", tags=["聊天"])
+# WebSocket 路由不使用 /api/chat 前缀
+ws_router = APIRouter(tags=["聊天"])
 
 
 @router.post("/message", response_model=ChatResponse)
 async def chat(
     request: ChatRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    background_tasks: BackgroundTasks,
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
     """
     处理用户聊天消息请求
     
+    问候、感谢、告别等不需要话术数据的意图直接返回固定回复，不创建数据库会话、不读取上下文，
+    对话记录在响应发送后才放入写入队列。
+    其他消息由 EnhancedAIService 处理，它基于同步 Session 编写，这里通过 AsyncSession.run_sync
+    在异步连接上执行整个对话流程，数据库读写由异步驱动完成，不阻塞事件循环。
+    用户消息和AI回复放入对话记录写入队列后即返回，由后台任务批量落库。
+    
     参数:
         request: 聊天请求对象，包含用户消息、会话ID、语气、长度等参数
-        db: 数据库会话依赖
+        background_tasks: 响应发送后执行的任务
         current_user: 当前激活用户依赖
     
     返回:
         ChatResponse: AI生成的回复，包含回复内容和意图
     """
-    # 初始化增强的AI服务
-    ai_service = EnhancedAIService(db)
-    
     # 获取或生成会话ID，用于跟踪对话上下文
     session_id = request.session_id or str(uuid.uuid4())
+    received_at = datetime.now()
     
-    # 获取历史对话上下文，限制最近5条记录，用于理解对话上下文
-    context = ai_service.get_conversation_history(
-        current_user.id, 
-        session_id, 
-        limit=5
-    )
+    response, analysis = _quick_reply(request, current_user, session_id)
+    if response is not None:
+        background_tasks.add_task(_log_exchange, request, response, analysis, current_user, session_id, received_at)
+        return response
     
-    # 保存用户的消息到数据库
-    ai_service.save_conversation(
-        user_id=current_user.id,
-        session_id=session_id,
-        message_type='user',
-        content=request.message,
-        intent=None
-    )
+    async with AsyncSessionLocal() as db:
+        response, analysis = await db.run_sync(_handle_message, request, current_user, session_id, analysis)
+    
+    # 保存用户的消息和AI助手的回复
+    await _log_exchange(request, response, analysis, current_user, session_id, received_at)
+    
+    # 返回AI生成的回复
+    return response
+
+
+# 只用于识别意图和生成固定回复，不访问数据库
+_small_talk = EnhancedAIService(None)
+
+
+def _quick_reply(
+    request: ChatRequest,
+    current_user: UserSnapshot,
+    session_id: str
+) -> Tuple[Optional[ChatResponse], MessageAnalysis]:
+    # 固定回复的意图不受会话上下文影响，无需读取上下文；其他意图回复为 None，走完整流程，
+    # 不带上下文的识别结果一并返回，完整流程只需结合上下文补全，不再重新扫描消息
+    analysis = _small_talk.analyze_message(request.message, current_user)
+    return _small_talk.small_talk_response(analysis, current_user, session_id), analysis
+
+
+def _prepare_message(
+    db: Session,
+    current_user: UserSnapshot,
+    session_id: str,
+    analysis: MessageAnalysis
+) -> Tuple[MessageAnalysis, List[dict]]:
+    # 读取会话上下文（内存缓存未命中时才查询数据库），用上下文补全场景和岗位
+    ai_service = EnhancedAIService(db)
+    context = ai_service.get_session_context(current_user.id, session_id)
+    return ai_service.apply_context(analysis, context), context
+
+
+def _handle_message(
+    db: Session,
+    request: ChatRequest,
+    current_user: UserSnapshot,
+    session_id: str,
+    analysis: MessageAnalysis = None,
+    context: List[dict] = None
+) -> Tuple[ChatResponse, MessageAnalysis]:
+    # 初始化增强的AI服务
+    ai_service = EnhancedAIService(db)
+    if context is None:
+        context = ai_service.get_session_context(current_user.id, session_id)
     
-    # 生成AI回复，传入用户消息、用户信息、会话ID、语气、长度等参数
-    response = ai_service.generate_chat_response(
+    # 生成AI回复（相同请求命中回复缓存），传入用户消息、用户信息、会话ID、语气、长度等参数
+    return ai_service.answer(
         message=request.message,
         user=current_user,
         session_id=session_id,
         position=request.position,
         tone=request.tone,
         length=request.length,
-        context=context
+        context=context,
+        analysis=analysis
     )
+
+
+@router.post("/message/stream")
+async def chat_stream(
+    request: ChatRequest,
+    current_user: UserSnapshot = Depends(get_current_active_user)
+):
+    """
+    以 Server-Sent Events 流式返回聊天回复
+    
+    与 /message 使用相同的请求体和处理流程，按以下顺序推送事件：
+    - meta: 意图识别完成后立即推送，包含会话ID、意图、识别到的场景和岗位，不等待话术检索
+    - reply: 回复文本（包含匹配到的话术数量，因此在检索完成后推送）
+    - script: 每条匹配到的话术各推送一次，数据为 ScriptResponse
+    - done: 全部推送完毕，包含意图和话术数量
+    对话记录在 done 之后放入写入队列，不占用响应时间。
+    原有 JSON 接口保留给不支持流式读取的客户端。
+    
+    参数:
+        request: 聊天请求对象，包含用户消息、会话ID、语气、长度等参数
+        current_user: 当前激活用户依赖
+    
+    返回:
+        StreamingResponse: text/event-stream 响应
     
-    # 保存AI助手的回复到数据库
-    ai_service.save_conversation(
+    示例:
+        event: meta
+        data: {"session_id": "...", "intent": "search", "scene": "需求沟通", "position": null}
+        
+        event: reply
+        data: {"reply": "为您找到了3条需求沟通相关的话术："}
+    """
+    session_id = request.session_id or str(uuid.uuid4())
+    received_at = datetime.now()
+    return StreamingResponse(
+        _stream_message(request, current_user, session_id, received_at),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _sse(event: str, data: str) -> str:
+    # SSE 事件格式：事件名 + 单行 JSON 数据，以空行结束
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+def _meta_event(request: ChatRequest, analysis: MessageAnalysis, session_id: str) -> str:
+    return _sse("meta", json.dumps({
+        "session_id": session_id,
+        "intent": analysis.intent,
+        "scene": analysis.scene,
+        "position": analysis.position or request.position
+    }, ensure_ascii=False))
+
+
+async def _stream_message(
+    request: ChatRequest,
+    current_user: UserSnapshot,
+    session_id: str,
+    received_at: datetime
+) -> AsyncIterator[str]:
+    response, analysis = _quick_reply(request, current_user, session_id)
+    if response is not None:
+        yield _meta_event(request, analysis, session_id)
+    else:
+        # 响应体在路由返回后才开始发送，此时依赖注入的会话可能已关闭，因此单独创建会话
+        async with AsyncSessionLocal() as db:
+            analysis, context = await db.run_sync(_prepare_message, current_user, session_id, analysis)
+            yield _meta_event(request, analysis, session_id)
+            
+            response, analysis = await db.run_sync(
+                _handle_message, request, current_user, session_id, analysis, context
+            )
+    
+    yield _sse("reply", json.dumps({"reply": response.reply}, ensure_ascii=False))
+    for script in response.scripts:
+        yield _sse("script", script.model_dump_json())
+    yield _sse("done", json.dumps({"intent": response.intent, "count": len(response.scripts)}))
+    
+    await _log_exchange(request, response, analysis, current_user, session_id, received_at)
+
+
+async def _log_exchange(
+    request: ChatRequest,
+    response: ChatResponse,
+    analysis: MessageAnalysis,
+    current_user: UserSnapshot,
+    session_id: str,
+    received_at: datetime
+):
+    # 用户消息和AI回复放入对话记录写入队列，由后台任务批量落库；
+    # 回复记录带上本轮的场景、岗位和关键词，供后续追问沿用
+    await conversation_log.append(
+        user_id=current_user.id,
+        session_id=session_id,
+        message_type='user',
+        content=request.message,
+        intent=None,
+        created_at=received_at
+    )
+    await conversation_log.append(
         user_id=current_user.id,
         session_id=session_id,
         message_type='assistant',
         content=response.reply,
+        context_data={
+            "scene": analysis.scene,
+            "position": analysis.position or request.position,
+            "keywords": analysis.keywords
+        },
         intent=response.intent,
         referenced_script_id=None
     )
+
+
+@ws_router.websocket("/ws/chat")
+async def chat_websocket(websocket: WebSocket, token: str = None):
+    """
+    通过 WebSocket 收发聊天消息
     
-    # 返回AI生成的回复
-    return response
+    连接建立时校验一次令牌并加载用户快照，之后整个连接复用同一个用户快照、数据库会话和
+    会话上下文，每轮对话不再重复解析令牌、查询用户、创建会话和读取历史记录。
+    适合一次会话中连续发送大量消息的客户端，HTTP 接口保持不变。
+    
+    参数:
+        websocket: WebSocket 连接
+        token: JWT访问令牌，浏览器无法为 WebSocket 设置请求头，因此通过查询参数传递
+    
+    消息格式:
+        客户端每次发送一个 JSON 文本，字段与 ChatRequest 相同；省略 session_id 时沿用本连接
+        当前的会话（首次为新生成的会话ID），指定其他 session_id 时切换会话并加载其上下文。
+        服务端每条消息回复一个 ChatResponse JSON，请求格式错误时回复 {"detail": "..."}，连接保持。
+    
+    异常:
+        令牌无效、用户不存在或已被禁用时以 1008 关闭连接
+    
+    示例:
+        ws://localhost:8000/ws/chat?token=<access_token>
+        -> {"message": "需求变更怎么沟通", "tone": "委婉"}
+        <- {"reply": "为您找到了1条需求沟通相关的话术：", "scripts": [...], "intent": "search", "session_id": "..."}
+    """
+    username = verify_token(token) if token else None
+    current_user = await load_user_snapshot(username) if username is not None else None
+    if current_user is None or not current_user.is_active:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    await websocket.accept()
+    session_id = str(uuid.uuid4())
+    context = deque(maxlen=session_context.maxlen)
+    
+    # 连接期间复用同一个会话；每轮结束后提交以归还数据库连接
+    async with AsyncSessionLocal() as db:
+        try:
+            while True:
+                text = await websocket.receive_text()
+                received_at = datetime.now()
+                try:
+                    request = ChatRequest.model_validate_json(text)
+                except ValidationError as e:
+                    await websocket.send_json({"detail": e.errors(include_url=False, include_context=False)})
+                    continue
+                
+                if request.session_id and request.session_id != session_id:
+                    # 切换到其他会话时加载一次该会话的上下文
+                    session_id = request.session_id
+                    context = deque(
+                        await db.run_sync(
+                            lambda session: EnhancedAIService(session).get_session_context(current_user.id, session_id)
+                        ),
+                        maxlen=session_context.maxlen
+                    )
+                
+                response, analysis = _quick_reply(request, current_user, session_id)
+                if response is None:
+                    response, analysis = await db.run_sync(
+                        _handle_message, request, current_user, session_id, analysis, list(context)
+                    )
+                    await db.commit()
+                await websocket.send_text(response.model_dump_json())
+                
+                await _log_exchange(request, response, analysis, current_user, session_id, received_at)
+                context.append(context_entry('user', request.message))
+                context.append(context_entry('assistant', response.reply, response.intent, {
+                    "scene": analysis.scene,
+                    "position": analysis.position or request.position,
+                    "keywords": analysis.keywords
+                }))
+        except WebSocketDisconnect:
+            pass
 
 
 @router.post("/adjust", response_model=ScriptAdjustResponse)
 async def adjust_script(
     request: ScriptAdjustRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     调整脚本的语气和长度
@@ -101,17 +333,15 @@ async def adjust_script(
     异常:
         HTTPException: 当脚本不存在时返回404错误
     """
-    # 初始化增强的AI服务
-    ai_service = EnhancedAIService(db)
-    
     try:
         # 调用AI服务调整脚本
-        result = ai_service.adjust_script(
-            script_id=request.script_id,
-            tone=request.tone,
-            length_type=request.length_type
+        return await db.run_sync(
+            lambda session: EnhancedAIService(session).adjust_script(
+                script_id=request.script_id,
+                tone=request.tone,
+                length_type=request.length_type
+            )
         )
-        return result
     except ValueError as e:
         # 处理脚本不存在的情况，返回404错误
         from fastapi import HTTPException, status
@@ -121,11 +351,42 @@ async def adjust_script(
         )
 
 
+@router.post("/adjust/batch", response_model=List[ScriptAdjustBatchItem])
+async def adjust_scripts(
+    request: ScriptAdjustBatchRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    批量调整多条话术的语气和长度
+    
+    用户切换语气或长度时，前端把当前显示的话术一次性提交，服务端用一次 IN 查询读取
+    预先生成的话术变体，替代逐条调用 /adjust。
+    
+    参数:
+        request: 批量调整请求对象，包含话术ID列表（最多100个）、目标语气和长度类型
+        db: 数据库会话依赖
+    
+    返回:
+        List[ScriptAdjustBatchItem]: 按请求顺序排列的调整结果，重复的ID只返回一次，不存在的话术不返回
+    
+    示例:
+        POST /api/chat/adjust/batch
+        {"script_ids": [3, 12, 40], "tone": "委婉", "length_type": "简洁版"}
+    """
+    return await db.run_sync(
+        lambda session: EnhancedAIService(session).adjust_scripts(
+            script_ids=request.script_ids,
+            tone=request.tone,
+            length_type=request.length_type
+        )
+    )
+
+
 @router.get("/history/{session_id}")
 async def get_chat_history(
     session_id: str,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
     """
     获取指定会话的聊天历史记录
@@ -144,10 +405,10 @@ async def get_chat_history(
             - referenced_script_id: 引用的脚本ID
             - created_at: 创建时间
     """
-    # 初始化增强的AI服务
-    ai_service = EnhancedAIService(db)
     # 获取该会话的对话历史
-    history = ai_service.get_conversation_history(current_user.id, session_id)
+    history = await db.run_sync(
+        lambda session: EnhancedAIService(session).get_conversation_history(current_user.id, session_id)
+    )
     
     # 将历史记录转换为字典格式，并按时间倒序排列
     return [
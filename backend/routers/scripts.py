@@ -2,26 +2,65 @@
 # 提供话术的搜索、详情查看、点赞、收藏等功能
 
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
-from typing import List, Optional
+from sqlalchemy import select, func, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import List, Optional, Set, Union
 
 # 数据库模型导入
-from models.database import get_db, Script, ScriptCategory, UserFavorite, User
+from models.database import get_async_db, Script, ScriptCategory, UserFavorite
 # 数据模型/响应模型导入
 from models.schemas import (
     ScriptResponse,    # 话术列表项响应模型
     ScriptDetail,     # 话术详情响应模型
     SearchResponse,   # 搜索结果响应模型
+    FacetCount,       # 分面取值数量模型
+    SuggestResponse,  # 输入联想响应模型
     UserFavoriteCreate,  # 创建收藏请求模型
-    UserFavoriteResponse # 收藏响应模型
+    UserFavoriteResponse, # 收藏响应模型
+    FavoriteListResponse, # 收藏列表响应模型
+    UserSnapshot      # 当前用户快照
 )
 # 认证工具
 from utils.auth import get_current_active_user
+# 话术关键词检索与分面统计
+from services.search_index import script_index, keyword_filter, script_rank_keys
+from services.facets import script_facets
+from services.suggest import script_suggester
+from services.script_tags import tag_condition
+# 使用次数、点赞数批量计数和点赞去重
+from services.script_counters import script_counters
+from services.script_likes import script_likes
+# 缓存与分页工具
+from services.catalog import catalog_version
+from utils.cache import VersionedCache
+from utils.pagination import encode_cursor, decode_cursor
+from config import get_settings
+
+settings = get_settings()
 
 # 创建话术路由器，指定前缀和标签
 router = APIRouter(prefix="/api/scripts", tags=["话术"])
 
+# 话术列表关键词搜索的字段
+KEYWORD_FIELDS = ('title', 'content', 'tags')
+
+# 按筛选条件缓存的话术总数，total_mode=cached 时复用
+_count_cache = VersionedCache(
+    catalog_version,
+    maxsize=1024,
+    ttl=settings.SCRIPT_COUNT_CACHE_TTL,
+    name='script_count'
+)
+
+# 按筛选条件和分页参数缓存的话术列表响应，话术目录版本变化时整体失效
+_list_cache = VersionedCache(
+    catalog_version,
+    maxsize=settings.SEARCH_CACHE_SIZE,
+    ttl=settings.SEARCH_CACHE_TTL,
+    name='script_list'
+)
+
 
 @router.get("/", response_model=SearchResponse)
 async def get_scripts(
@@ -30,77 +69,274 @@ async def get_scripts(
     scene_type: Optional[str] = Query(None, description="场景类型"),
     tone: Optional[str] = Query(None, description="语气"),
     keyword: Optional[str] = Query(None, description="关键词"),
+    tag: Optional[str] = Query(None, description="标签，按完整标签名精确匹配"),
     page: int = Query(1, ge=1, description="页码"),
     page_size: int = Query(10, ge=1, le=50, description="每页数量"),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="分页游标，取自上一页的next_cursor，传入时忽略page"),
+    total_mode: str = Query("exact", pattern="^(exact|cached)$", description="总数计算方式：exact-精确计数，cached-使用缓存的总数"),
+    with_facets: bool = Query(False, description="是否返回各分面取值的话术数量"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取话术列表接口
     
-    支持多维度筛选和分页查询，包括岗位、分类、场景类型、语气、关键词等筛选条件。
+    支持多维度筛选和分页查询，包括岗位、分类、场景类型、语气、关键词、标签等筛选条件。
+    支持两种分页方式：
+    - 页码分页：page + page_size，兼容旧客户端
+    - 游标分页：cursor + page_size，按 (使用次数, ID) 或相关度做键集分页，翻到深页也不需要 OFFSET 扫描
+    相同筛选条件和分页参数的响应会被缓存，话术内容变更时缓存失效。
+    分面位图索引就绪时，筛选条件通过位图按位与求出候选话术，在内存中排序分页后只按ID加载当前页，
+    总数和分面数量由位图运算得到，不再执行带筛选条件的查询和 COUNT(*)。
     
     Args:
         position_id: 岗位ID，可选，用于筛选特定岗位的话术
         category_id: 分类ID，可选，用于筛选特定分类下的话术
         scene_type: 场景类型，可选，如：需求沟通、项目推进、Bug处理等
         tone: 语气，可选，如：温和、专业、强硬、活泼、委婉
-        keyword: 关键词，可选，在标题、内容、标签中搜索
+        keyword: 关键词，可选，在标题、内容、标签中搜索，结果按相关度排序
+        tag: 标签，可选，通过 script_tags 索引精确匹配完整标签，不会匹配到其他标签的子串
         page: 页码，默认为1，最小值为1
         page_size: 每页数量，默认为10，范围1-50
+        cursor: 分页游标，可选，取自上一页响应的 next_cursor
+        total_mode: 总数计算方式，分面索引不可用时生效，exact 每次执行 COUNT(*)，cached 复用短时间内缓存的总数
+        with_facets: 是否返回分面统计，默认否；统计某个分面时不应用该分面自身的筛选条件
         db: 数据库会话
     
     Returns:
-        SearchResponse: 包含话术列表、总数、分页信息的响应
+        SearchResponse: 包含话术列表、总数、分页信息、下一页游标和分面统计的响应
+    
+    Raises:
+        HTTPException: 游标无效时返回400
     
     Example:
         GET /api/scripts?position_id=3&scene_type=需求沟通&page=1&page_size=10
+        GET /api/scripts?scene_type=需求沟通&page_size=10&cursor=eyJrIjoidSIsInYiOlszLDEyXX0&total_mode=cached
+        GET /api/scripts?position_id=3&tone=温和&with_facets=true
+        GET /api/scripts?tag=需求变更&page_size=20
     """
-    query = db.query(Script).filter(Script.is_active == True)
+    keyword = keyword.strip() if keyword else None
+    tag = tag.strip() if tag else None
+    cache_key = (position_id, category_id, scene_type, tone, keyword, tag, page, page_size, cursor, with_facets)
+    version = catalog_version()
+    cached = _list_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    facet_filters = {'is_active': True}
+    for field, value in (('position_id', position_id), ('category_id', category_id), ('scene_type', scene_type), ('tone', tone)):
+        if value:
+            facet_filters[field] = value
+    
+    # 分面位图就绪时，筛选条件按位图与运算求出候选话术，在内存中排序分页，只按ID加载当前页；
+    # 关键词命中由内存索引转换为位图，标签命中由 script_tags 索引查询后转换为位图
+    use_bitmaps = script_facets.ready and (script_index.ready or not keyword)
+    base = -1
+    if use_bitmaps:
+        if keyword:
+            base = script_facets.bitmap_of(script_index.search([keyword], KEYWORD_FIELDS))
+        if tag:
+            tagged = await db.scalars(select(Script.id).where(tag_condition([tag])))
+            base &= script_facets.bitmap_of(tagged.all())
+    
+    try:
+        if use_bitmaps:
+            scripts, total, next_cursor = await _page_by_bitmap(
+                db, script_facets.bitmap(facet_filters) & base, keyword, page, page_size, cursor
+            )
+        else:
+            scripts, total, next_cursor = await _page_by_sql(
+                db, position_id, category_id, scene_type, tone, keyword, tag, page, page_size, cursor, total_mode, version
+            )
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="无效的分页游标"
+        )
+    
+    facets = None
+    if with_facets and use_bitmaps:
+        facets = {
+            field: [
+                FacetCount(value=value, count=count)
+                for value, count in sorted(counts.items(), key=lambda item: -item[1])
+            ]
+            for field, counts in script_facets.counts(facet_filters, base).items()
+        }
+    
+    response = SearchResponse(
+        scripts=[ScriptResponse.model_validate(script) for script in scripts],
+        total=total,
+        page=page,
+        page_size=page_size,
+        total_pages=(total + page_size - 1) // page_size,
+        next_cursor=next_cursor,
+        facets=facets
+    )
+    _list_cache.set(cache_key, response, version=version)
+    return response
+
+
+async def _page_by_sql(
+    db: AsyncSession,
+    position_id: Optional[int],
+    category_id: Optional[int],
+    scene_type: Optional[str],
+    tone: Optional[str],
+    keyword: Optional[str],
+    tag: Optional[str],
+    page: int,
+    page_size: int,
+    cursor: Optional[str],
+    total_mode: str,
+    version: int
+):
+    # 分面位图未就绪时用 SQL 条件筛选
+    conditions = [Script.is_active == True]
     
     if position_id:
-        query = query.filter(Script.position_id == position_id)
+        conditions.append(Script.position_id == position_id)
     
     if category_id:
-        query = query.filter(Script.category_id == category_id)
+        conditions.append(Script.category_id == category_id)
     
     if scene_type:
-        query = query.filter(Script.scene_type == scene_type)
+        conditions.append(Script.scene_type == scene_type)
     
     if tone:
-        query = query.filter(Script.tone == tone)
+        conditions.append(Script.tone == tone)
     
+    keyword_ids = None
     if keyword:
-        query = query.filter(
-            or_(
-                Script.title.like(f'%{keyword}%'),
-                Script.content.like(f'%{keyword}%'),
-                Script.tags.like(f'%{keyword}%')
-            )
-        )
+        # 单个关键词只会生成 SQL 条件或命中ID集合之一，集合在按相关度分页时于内存中过滤
+        keyword_sql, keyword_ids = keyword_filter([keyword], fields=KEYWORD_FIELDS)
+        if keyword_sql is not None:
+            conditions.append(keyword_sql)
+    
+    if tag:
+        conditions.append(tag_condition([tag]))
+    
+    if keyword and script_index.ready:
+        return await _page_by_relevance(db, conditions, keyword, keyword_ids, page, page_size, cursor)
+    
+    scripts, next_cursor = await _page_by_usage(db, conditions, page, page_size, cursor)
+    count_key = (position_id, category_id, scene_type, tone, keyword, tag)
+    total = _count_cache.get(count_key) if total_mode == "cached" else None
+    if total is None:
+        total = await db.scalar(select(func.count()).select_from(Script).where(*conditions))
+        _count_cache.set(count_key, total, version=version)
+    return scripts, total, next_cursor
+
+
+async def _page_by_bitmap(db: AsyncSession, bitmap: int, keyword: Optional[str], page: int, page_size: int, cursor: Optional[str]):
+    # 候选话术及其使用次数直接从位图索引展开，有关键词时按相关度排序，否则按 (使用次数降序, ID升序) 排序
+    rows = script_facets.usage_rows(bitmap)
+    if keyword:
+        keys = script_rank_keys(rows, [keyword], fields=KEYWORD_FIELDS)
+        return await _page_by_keys(db, keys, "relevance", page, page_size, cursor)
+    keys = sorted(((usage, -sid) for sid, usage in rows), reverse=True)
+    return await _page_by_keys(db, keys, "usage", page, page_size, cursor)
+
+
+async def _page_by_keys(db: AsyncSession, keys: list, kind: str, page: int, page_size: int, cursor: Optional[str]):
+    # keys 为降序排列的排序键，最后一个元素为 -话术ID；usage 游标沿用 [使用次数, 话术ID] 格式
+    if cursor:
+        last_key = decode_cursor(cursor, kind)
+        if kind == "usage":
+            last_key = [last_key[0], -last_key[1]]
+        last_key = tuple(last_key)
+        start = next((i for i, key in enumerate(keys) if key < last_key), len(keys))
+    else:
+        start = (page - 1) * page_size
+    
+    page_keys = keys[start:start + page_size]
+    next_cursor = None
+    if start + page_size < len(keys) and page_keys:
+        last = list(page_keys[-1])
+        next_cursor = encode_cursor(kind, [last[0], -last[1]] if kind == "usage" else last)
+    
+    page_ids = [-key[-1] for key in page_keys]
+    by_id = {s.id: s for s in await db.scalars(select(Script).where(Script.id.in_(page_ids)))} if page_ids else {}
+    return [by_id[sid] for sid in page_ids if sid in by_id], len(keys), next_cursor
+
+
+async def _page_by_usage(db: AsyncSession, conditions: list, page: int, page_size: int, cursor: Optional[str]):
+    # 按 (使用次数降序, ID升序) 排序；有游标时用键集条件代替 OFFSET，多取一条判断是否还有下一页
+    query = select(Script).where(*conditions).order_by(Script.usage_count.desc(), Script.id.asc())
+    if cursor:
+        usage_count, last_id = decode_cursor(cursor, "usage")
+        query = query.where(or_(
+            Script.usage_count < usage_count,
+            and_(Script.usage_count == usage_count, Script.id > last_id)
+        ))
+    else:
+        query = query.offset((page - 1) * page_size)
+    
+    scripts = (await db.scalars(query.limit(page_size + 1))).all()
+    next_cursor = None
+    if len(scripts) > page_size:
+        scripts = scripts[:page_size]
+        next_cursor = encode_cursor("usage", [scripts[-1].usage_count, scripts[-1].id])
+    return scripts, next_cursor
+
+
+async def _page_by_relevance(
+    db: AsyncSession,
+    conditions: list,
+    keyword: str,
+    keyword_ids: Optional[Set[int]],
+    page: int,
+    page_size: int,
+    cursor: Optional[str]
+):
+    # 关键词搜索按 BM25 相关度与使用次数综合排序，候选只取ID和使用次数，游标为最后一条的排序键
+    candidates = (await db.execute(select(Script.id, Script.usage_count).where(*conditions))).all()
+    if keyword_ids is not None:
+        candidates = [row for row in candidates if row.id in keyword_ids]
+    keys = script_rank_keys(
+        candidates,
+        [keyword],
+        fields=KEYWORD_FIELDS
+    )
+    return await _page_by_keys(db, keys, "relevance", page, page_size, cursor)
+
+
+@router.get("/suggest", response_model=SuggestResponse)
+async def suggest_scripts(
+    q: str = Query(..., max_length=50, description="用户已输入的前缀"),
+    limit: int = Query(8, ge=1, le=settings.SUGGEST_TOP_K, description="返回数量")
+):
+    """
+    话术输入联想接口
     
-    total = query.count()
-    scripts = query.order_by(Script.usage_count.desc()).offset((page - 1) * page_size).limit(page_size).all()
+    根据用户已输入的前缀，返回匹配的话术标题和标签，按使用次数从高到低排序。
+    结果直接从内存前缀树读取，不访问数据库，适合在输入框每次按键时调用。
+    注意：该路由必须声明在 /{script_id} 之前，否则 suggest 会被当作话术ID解析。
     
-    return SearchResponse(
-        scripts=[ScriptResponse.model_validate(script) for script in scripts],
-        total=total,
-        page=page,
-        page_size=page_size,
-        total_pages=(total + page_size - 1) // page_size
-    )
+    Args:
+        q: 输入前缀，不区分大小写，去除首尾空白后为空时返回空列表
+        limit: 返回数量，默认8，最大为配置的 SUGGEST_TOP_K
+    
+    Returns:
+        SuggestResponse: 包含查询前缀和联想词条列表，每个词条包含文本、类型（title/tag）、
+                         对应的使用次数最高的话术ID及其使用次数
+    
+    Example:
+        GET /api/scripts/suggest?q=需求&limit=5
+    """
+    return SuggestResponse(query=q, suggestions=script_suggester.suggest(q, limit))
 
 
 @router.get("/{script_id}", response_model=ScriptDetail)
 async def get_script(
     script_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
     """
     获取话术详情接口
     
-    返回话术的完整信息，包括分类、是否已收藏等。
-    查看话术时会自动增加使用次数。
+    返回话术的完整信息，包括分类、是否已收藏、是否已点赞等。
+    查看话术时会自动增加使用次数，增量由后台任务批量写入数据库。
     
     Args:
         script_id: 话术ID
@@ -116,24 +352,25 @@ async def get_script(
     Example:
         GET /api/scripts/123
     """
-    script = db.query(Script).filter(Script.id == script_id).first()
+    script = await db.get(Script, script_id)
     if not script:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="话术不存在"
         )
     
-    category = db.query(ScriptCategory).filter(ScriptCategory.id == script.category_id).first()
+    category = await db.get(ScriptCategory, script.category_id)
     
-    favorite = db.query(UserFavorite).filter(
+    favorite = await db.scalar(select(UserFavorite).where(
         and_(
             UserFavorite.user_id == current_user.id,
             UserFavorite.script_id == script_id
         )
-    ).first()
+    ))
     
-    script.usage_count += 1
-    db.commit()
+    # 使用次数增量由后台任务批量写入，返回值包含尚未写入的增量和本次查看
+    usage_count = script.usage_count + script_counters.pending(script_id, 'usage_count') + 1
+    await script_counters.add(script_id, 'usage_count')
     
     return ScriptDetail(
         id=script.id,
@@ -146,57 +383,75 @@ async def get_script(
         tone=script.tone,
         target_audience=script.target_audience,
         tags=script.tags,
-        usage_count=script.usage_count,
-        like_count=script.like_count,
+        usage_count=usage_count,
+        like_count=script.like_count + script_counters.pending(script_id, 'like_count'),
         is_free=script.is_free,
         created_at=script.created_at,
         category=category,
-        is_favorite=favorite is not None
+        is_favorite=favorite is not None,
+        is_liked=await script_likes.has_liked(current_user.id, script_id)
     )
 
 
 @router.post("/{script_id}/like", status_code=status.HTTP_200_OK)
 async def like_script(
     script_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
     """
     点赞话术接口
     
     为指定的话术增加点赞次数，用于统计用户对话术的喜爱程度。
+    每个用户对同一话术只能点赞一次，重复点赞在内存中判定，不访问数据库。
+    点赞记录和点赞数由后台任务批量写入。
     
     Args:
         script_id: 话术ID
         db: 数据库会话
+        current_user: 当前登录用户
     
     Returns:
         dict: 包含成功消息和当前点赞数的响应
     
     Raises:
-        HTTPException: 话术不存在时返回404
+        HTTPException: 已点赞过返回400，话术不存在时返回404
     
     Example:
         POST /api/scripts/123/like
         Response: {"message": "点赞成功", "like_count": 10}
     """
-    script = db.query(Script).filter(Script.id == script_id).first()
+    not_found = HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="话术不存在"
+    )
+    already_liked = HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="已经点赞过该话术"
+    )
+    if script_id <= 0:
+        raise not_found
+    # 重复点赞只查内存位图，不访问数据库
+    if await script_likes.has_liked(current_user.id, script_id):
+        raise already_liked
+    
+    script = await db.get(Script, script_id)
     if not script:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="话术不存在"
-        )
+        raise not_found
     
-    script.like_count += 1
-    db.commit()
+    # 返回值包含尚未写入的增量和本次点赞
+    like_count = script.like_count + script_counters.pending(script_id, 'like_count') + 1
+    if not await script_likes.like(current_user.id, script_id):
+        raise already_liked
     
-    return {"message": "点赞成功", "like_count": script.like_count}
+    return {"message": "点赞成功", "like_count": like_count}
 
 
 @router.post("/favorites", response_model=UserFavoriteResponse, status_code=status.HTTP_201_CREATED)
 async def add_favorite(
     favorite: UserFavoriteCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
     """
     添加收藏接口
@@ -219,19 +474,19 @@ async def add_favorite(
         POST /api/scripts/favorites
         Body: {"script_id": 123, "custom_content": "自定义内容"}
     """
-    script = db.query(Script).filter(Script.id == favorite.script_id).first()
+    script = await db.get(Script, favorite.script_id)
     if not script:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="话术不存在"
         )
     
-    existing = db.query(UserFavorite).filter(
+    existing = await db.scalar(select(UserFavorite).where(
         and_(
             UserFavorite.user_id == current_user.id,
             UserFavorite.script_id == favorite.script_id
         )
-    ).first()
+    ))
     
     if existing:
         raise HTTPException(
@@ -246,8 +501,8 @@ async def add_favorite(
     )
     
     db.add(db_favorite)
-    db.commit()
-    db.refresh(db_favorite)
+    await db.commit()
+    await db.refresh(db_favorite)
     
     return db_favorite
 
@@ -255,8 +510,8 @@ async def add_favorite(
 @router.delete("/favorites/{script_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def remove_favorite(
     script_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
     """
     取消收藏接口
@@ -277,12 +532,12 @@ async def remove_favorite(
     Example:
         DELETE /api/scripts/favorites/123
     """
-    favorite = db.query(UserFavorite).filter(
+    favorite = await db.scalar(select(UserFavorite).where(
         and_(
             UserFavorite.user_id == current_user.id,
             UserFavorite.script_id == script_id
         )
-    ).first()
+    ))
     
     if not favorite:
         raise HTTPException(
@@ -290,48 +545,110 @@ async def remove_favorite(
             detail="收藏不存在"
         )
     
-    db.delete(favorite)
-    db.commit()
+    await db.delete(favorite)
+    await db.commit()
     
     return None
 
 
-@router.get("/favorites/list", response_model=List[UserFavoriteResponse])
+# 收藏列表可投影的字段，script 为关联的话术信息
+FAVORITE_FIELDS = ('id', 'user_id', 'script_id', 'custom_content', 'script', 'created_at')
+
+
+@router.get("/favorites/list", response_model=Union[List[UserFavoriteResponse], FavoriteListResponse])
 async def get_favorites(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    page_size: Optional[int] = Query(None, ge=1, le=100, description="每页数量，不传时返回全部收藏"),
+    cursor: Optional[str] = Query(None, description="分页游标，取自上一页的next_cursor"),
+    fields: Optional[str] = Query(None, description="返回的字段，逗号分隔，可选 id、user_id、script_id、custom_content、script、created_at，默认全部"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: UserSnapshot = Depends(get_current_active_user)
 ):
     """
     获取收藏列表接口
     
-    返回当前用户的所有收藏记录，按创建时间倒序排列。
+    返回当前用户的收藏记录，按创建时间倒序排列。
     包含话术的完整信息和用户自定义内容。
     
+    收藏记录与话术通过一次联表查询取出，不再逐条查询话术；
+    按 (创建时间, ID) 做游标分页；fields 不包含 script 时只查询收藏表字段，
+    适合只需要已收藏话术ID的页面。
+    page_size、cursor、fields 都不传时保持原有格式，直接返回全部收藏的数组，兼容旧客户端。
+    
     Args:
+        page_size: 每页数量，可选，不传时返回全部收藏
+        cursor: 分页游标，可选，取自上一页响应的 next_cursor
+        fields: 返回的字段，可选，逗号分隔
         db: 数据库会话
         current_user: 当前登录用户
     
     Returns:
-        List[UserFavoriteResponse]: 收藏列表
+        FavoriteListResponse: 收藏列表和下一页游标（没有下一页时为 null）；
+        三个参数都不传时为 List[UserFavoriteResponse]
+    
+    Raises:
+        HTTPException: 游标无效或字段名不存在时返回400
     
     Example:
         GET /api/scripts/favorites/list
+        GET /api/scripts/favorites/list?page_size=20
+        GET /api/scripts/favorites/list?fields=script_id
     """
-    favorites = db.query(UserFavorite).filter(
+    selected = FAVORITE_FIELDS
+    if fields:
+        selected = tuple(dict.fromkeys(field.strip() for field in fields.split(',') if field.strip()))
+        unknown = [field for field in selected if field not in FAVORITE_FIELDS]
+        if unknown or not selected:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"无效的字段: {', '.join(unknown)}" if unknown else "fields 不能为空"
+            )
+    with_script = 'script' in selected
+    
+    # 联表查询同时过滤掉话术已被删除的收藏
+    query = (
+        select(UserFavorite, Script) if with_script else select(UserFavorite)
+    ).join(Script, Script.id == UserFavorite.script_id).where(
         UserFavorite.user_id == current_user.id
-    ).order_by(UserFavorite.created_at.desc()).all()
-    
-    result = []
-    for favorite in favorites:
-        script = db.query(Script).filter(Script.id == favorite.script_id).first()
-        if script:
-            result.append(UserFavoriteResponse(
-                id=favorite.id,
-                user_id=favorite.user_id,
-                script_id=favorite.script_id,
-                custom_content=favorite.custom_content,
-                script=script,
-                created_at=favorite.created_at
-            ))
-    
-    return result
+    ).order_by(UserFavorite.created_at.desc(), UserFavorite.id.desc())
+    
+    if cursor:
+        try:
+            created_at, last_id = decode_cursor(cursor, "favorite")
+            created_at = datetime.fromisoformat(created_at)
+        except (ValueError, TypeError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="无效的分页游标"
+            )
+        query = query.where(or_(
+            UserFavorite.created_at < created_at,
+            and_(UserFavorite.created_at == created_at, UserFavorite.id < last_id)
+        ))
+    if page_size:
+        query = query.limit(page_size + 1)
+    
+    rows = (await db.execute(query)).all()
+    next_cursor = None
+    if page_size and len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1][0]
+        next_cursor = encode_cursor("favorite", [last.created_at.isoformat(), last.id])
+    
+    favorites = [
+        UserFavoriteResponse(
+            id=row[0].id,
+            user_id=row[0].user_id,
+            script_id=row[0].script_id,
+            custom_content=row[0].custom_content,
+            script=row[1] if with_script else None,
+            created_at=row[0].created_at
+        )
+        for row in rows
+    ]
+    if page_size is None and cursor is None and fields is None:
+        return favorites
+    
+    return FavoriteListResponse(
+        favorites=[favorite.model_dump(include=set(selected)) for favorite in favorites],
+        next_cursor=next_cursor
+    )
@@ -1,8 +1,14 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from models.database import get_db, Position, ScriptCategory
+from models.database import get_async_db, Position, ScriptCategory
 from models.schemas import PositionResponse, CategoryResponse
+from services.catalog import catalog_version
+from services.conversation_log import conversation_log
+from services.script_counters import script_counters
+from utils.auth import password_pool
+from utils.cache import cache_stats
 from datetime import datetime
 
 # 创建系统API路由器，前缀为/api/system，标签为"系统"
@@ -10,15 +16,16 @@ router = APIRouter(prefix="/api/system", tags=["系统"])
 
 
 @router.get("/positions", response_model=List[PositionResponse])
-async def get_positions(db: Session = Depends(get_db)):
+async def get_positions(db: AsyncSession = Depends(get_async_db)):
     """获取所有激活的职位列表
     
     Returns:
         List[PositionResponse]: 职位列表，按sort_order排序
     """
-    positions = db.query(Position).filter(
-        Position.is_active == True
-    ).order_by(Position.sort_order).all()
+    result = await db.execute(
+        select(Position).where(Position.is_active == True).order_by(Position.sort_order)
+    )
+    positions = result.scalars().all()
     
     return [PositionResponse.model_validate(pos) for pos in positions]
 
@@ -26,7 +33,7 @@ async def get_positions(db: Session = Depends(get_db)):
 @router.get("/categories", response_model=List[CategoryResponse])
 async def get_categories(
     position_id: int = None,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """获取脚本分类列表
     
@@ -37,12 +44,13 @@ async def get_categories(
     Returns:
         List[CategoryResponse]: 分类列表，按sort_order排序
     """
-    query = db.query(ScriptCategory).filter(ScriptCategory.is_active == True)
+    query = select(ScriptCategory).where(ScriptCategory.is_active == True)
     
     if position_id:
-        query = query.filter(ScriptCategory.position_id == position_id)
+        query = query.where(ScriptCategory.position_id == position_id)
     
-    categories = query.order_by(ScriptCategory.sort_order).all()
+    result = await db.execute(query.order_by(ScriptCategory.sort_order))
+    categories = result.scalars().all()
     
     return [CategoryResponse.model_validate(cat) for cat in categories]
 
@@ -60,3 +68,19 @@ async def health_check():
         "version": "1.0.0",
         "timestamp": datetime.now()
     }
+
+
+@router.get("/metrics")
+async def get_metrics():
+    """运行指标接口
+    
+    Returns:
+        dict: 包含话术目录版本号、各缓存命中/未命中统计、对话记录写入队列、话术计数聚合和密码哈希线程池统计的字典
+    """
+    return {
+        "catalog_version": catalog_version(),
+        "caches": cache_stats(),
+        "conversation_log": conversation_log.stats(),
+        "script_counters": script_counters.stats(),
+        "password_pool": password_pool.stats()
+    }
@@ -1,10 +1,86 @@
 import random
 import re
-from typing import List, Optional, Tuple, Dict
+import unicodedata
+from typing import List, NamedTuple, Optional, Tuple, Dict
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
-from models.database import Script, User, Position, Conversation, ScriptCategory
-from models.schemas import ChatResponse, ScriptResponse, ScriptAdjustResponse
+from sqlalchemy import or_, and_, case, func, true
+from models.database import Script, User, Position, Conversation, ScriptCategory, ScriptVariant
+from models.schemas import ChatResponse, ScriptResponse, ScriptAdjustResponse, ScriptAdjustBatchItem
+from services.search_index import SEARCH_FIELDS, script_index, keyword_filter, rank_script_ids
+from services.script_tags import tag_condition
+from services.catalog import catalog_version
+from services.conversation_log import conversation_log
+from services.session_context import context_entry, session_context
+from utils.aho_corasick import AhoCorasick
+from utils.cache import VersionedCache
+from config import get_settings
+
+settings = get_settings()
+
+# 检索结果缓存，键为规范化后的筛选条件，话术目录版本变化时整体失效
+_search_cache = VersionedCache(
+    catalog_version,
+    maxsize=settings.SEARCH_CACHE_SIZE,
+    ttl=settings.SEARCH_CACHE_TTL,
+    name='script_search'
+)
+
+# 完整聊天回复缓存，键为规范化后的消息及岗位、语气、长度，话术目录版本变化时整体失效
+_response_cache = VersionedCache(
+    catalog_version,
+    maxsize=settings.CHAT_CACHE_SIZE,
+    ttl=settings.CHAT_CACHE_TTL,
+    name='chat_response'
+)
+
+# 规范化消息时去掉的空白、标点和符号
+_NORMALIZE_PATTERN = re.compile(r'[\W_]+')
+
+
+def normalize_message(message: str) -> str:
+    """统一全半角和大小写，去掉空白和标点，使仅在这些方面不同的消息得到相同的缓存键"""
+    return _NORMALIZE_PATTERN.sub('', unicodedata.normalize('NFKC', message).lower())
+
+
+# 简洁版只保留第一句话
+_SENTENCE_SPLIT_PATTERN = re.compile(r'[。！？\n]')
+
+
+# 关键词在正文类字段中按子串匹配，标签只按完整标签名匹配，避免命中其他标签的子串
+TEXT_SEARCH_FIELDS = tuple(field for field in SEARCH_FIELDS if field != 'tags')
+
+
+class MessageAnalysis(NamedTuple):
+    """单次扫描用户消息得到的识别结果"""
+    intent: str
+    scene: Optional[str]
+    position: Optional[str]
+    keywords: List[str]
+
+
+def _build_message_matcher(intent_patterns, scene_patterns, position_keywords, core_words) -> AhoCorasick:
+    # 意图、场景、岗位关键词按原样匹配小写后的消息；核心词汇转为小写匹配，命中后再按原文大小写校验
+    patterns = []
+    for intent, keywords in intent_patterns.items():
+        patterns.extend((kw, ('intent', intent)) for kw in keywords)
+    for scene, pattern in scene_patterns.items():
+        patterns.extend((kw, ('scene', scene)) for kw in pattern['keywords'])
+    for position, keywords in position_keywords.items():
+        patterns.extend((kw, ('position', position)) for kw in keywords)
+    patterns.extend((word.lower(), ('core', None)) for word in core_words)
+    return AhoCorasick(patterns)
+
+
+def _build_tone_rewriters(tone_adjustments) -> Dict[str, Tuple[Optional[re.Pattern], Dict[str, str]]]:
+    # 每种语气的替换规则编译成一个正则分支，长词在前以保证最长匹配；一次扫描完成替换，替换结果不会再被其他规则改写
+    rewriters = {}
+    for tone, rules in tone_adjustments.items():
+        table = {old: new for old, new in rules.items() if old not in ('prefix', 'suffix') and old != new}
+        pattern = None
+        if table:
+            pattern = re.compile('|'.join(re.escape(old) for old in sorted(table, key=len, reverse=True)))
+        rewriters[tone] = (pattern, table)
+    return rewriters
 
 
 class EnhancedAIService:
@@ -111,81 +187,148 @@ class EnhancedAIService:
         }
     }
     
+    # 预定义的核心词汇表
+    CORE_WORDS = {
+        '需求', '沟通', '变更', '传递', '确认', '评审', '调研', '访谈', '对接', '咨询', '反馈', '澄清', '优先级',
+        '项目', '推进', '启动', '风险', '进度', '里程碑', '汇报', '任务', '分配', '协调', '资源', '计划', '目标',
+        'bug', 'Bug', '问题', '反馈', '修复', '验收', '分配', '协助', '异议', '优先级', '发现', '提交流程',
+        '客户', '接待', '投诉', '异议', '跟进', '寒暄', '拜访', '维护', '服务', '咨询', '沟通', '异议处理',
+        '售前', '产品经理', '项目经理', '前端', '后端', '测试', 'ui', '设计师',
+        '开发', '团队', '领导', '同事', '用户', '公司', '价格', '方案'
+    }
+    
+    STOP_WORDS = {'的', '了', '在', '是', '我', '有', '和', '就', '不', '人', '都', '一', '一个', '上', '也', '很', '到', '说', '要', '去', '你', '会', '着', '没有', '看', '好', '自己', '这', '如何', '应该', '怎么', '什么', '哪里', '可以', '需要', '想要', '希望', '了解', '知道', '觉得', '认为', '发现', '告诉', '提出', '描述', '开场', '结束'}
+    
+    # 意图、场景、岗位关键词和核心词汇在类定义时编译成一个 Aho-Corasick 自动机
+    _MATCHER = _build_message_matcher(INTENT_PATTERNS, SCENE_PATTERNS, POSITION_KEYWORDS, CORE_WORDS)
+    
+    # 语气替换规则在类定义时编译
+    _TONE_REWRITERS = _build_tone_rewriters(TONE_ADJUSTMENTS)
+    
+    # 岗位名称 -> 岗位ID，首次检索时加载
+    _position_ids: Optional[Dict[str, int]] = None
+    
     def __init__(self, db: Session):
         self.db = db
     
-    def detect_intent(self, message: str, context: List[dict] = None) -> Tuple[str, Optional[str]]:
-        message = message.lower()
-        
-        for intent, keywords in self.INTENT_PATTERNS.items():
-            for keyword in keywords:
-                if keyword in message:
-                    return intent, None
-        
-        return 'search', None
+    # 可以沿用上一轮场景和岗位的意图，如“换个委婉点的”“再来几条”
+    CONTEXT_INTENTS = {'search', 'adjust_tone', 'adjust_length'}
     
-    def detect_scene(self, message: str) -> Optional[str]:
-        message = message.lower()
+    def analyze_message(self, message: str, user: User = None, context: List[dict] = None) -> MessageAnalysis:
+        """
+        单次扫描消息，同时得到意图、场景、岗位和关键词
+
+        结果与分别调用 detect_intent、detect_scene、detect_position、extract_keywords 一致。
+        传入会话上下文时，消息本身没有提到场景或岗位的追问沿用最近一轮回复的场景和岗位。
+        """
+        lowered = message.lower()
+        same_length = len(lowered) == len(message)
+        
+        intents = set()
+        scene_hits = set()
+        positions = set()
+        core_hits = []
+        for start, pattern, (kind, group) in self._MATCHER.iter_matches(lowered):
+            if kind == 'intent':
+                intents.add(group)
+            elif kind == 'scene':
+                scene_hits.add((group, pattern))
+            elif kind == 'position':
+                positions.add(group)
+            elif same_length:
+                # 核心词汇区分大小写，以原文中的写法为准
+                surface = message[start:start + len(pattern)]
+                if surface in self.CORE_WORDS and surface not in core_hits:
+                    core_hits.append(surface)
+        
+        if not same_length:
+            core_hits = [word for word in self.CORE_WORDS if word in message]
+        
+        intent = next((i for i in self.INTENT_PATTERNS if i in intents), 'search')
         
         scene_scores = {}
         for scene, pattern in self.SCENE_PATTERNS.items():
-            score = 0
-            for keyword in pattern['keywords']:
-                if keyword in message:
-                    score += 1
+            score = sum(1 for kw in pattern['keywords'] if (scene, kw) in scene_hits)
             if score > 0:
                 scene_scores[scene] = score
+        scene = max(scene_scores, key=scene_scores.get) if scene_scores else None
         
-        if scene_scores:
-            return max(scene_scores, key=scene_scores.get)
+        position = self._position_from_user(user)
+        if position is None:
+            position = next((p for p in self.POSITION_KEYWORDS if p in positions), None)
         
-        return None
+        keywords = self._split_keywords(message, core_hits)
+        
+        return self.apply_context(MessageAnalysis(
+            intent=intent,
+            scene=scene,
+            position=position,
+            keywords=keywords
+        ), context)
+    
+    def apply_context(self, analysis: MessageAnalysis, context: List[dict] = None) -> MessageAnalysis:
+        """
+        结合会话上下文补全识别结果
+
+        不带上下文的识别结果可以先行计算（如判断是否为固定回复的意图），需要上下文时再补全，
+        无需重新扫描消息。对已补全的结果重复调用不会再改变结果。
+        """
+        if not context or analysis.intent not in self.CONTEXT_INTENTS:
+            return analysis
+        if analysis.scene is not None and analysis.position is not None:
+            return analysis
+        
+        last = self._carry_over(context)
+        scene, keywords = analysis.scene, analysis.keywords
+        if scene is None and last.get('scene'):
+            # 沿用场景时一并沿用上一轮的关键词，否则“再来几条”之类的追问检索不到话术
+            scene = last['scene']
+            keywords = keywords + [kw for kw in last.get('keywords') or [] if kw not in keywords]
+        return analysis._replace(
+            scene=scene,
+            position=analysis.position or last.get('position'),
+            keywords=keywords
+        )
+    
+    def detect_intent(self, message: str, context: List[dict] = None) -> Tuple[str, Optional[str]]:
+        analysis = self.analyze_message(message, context=context)
+        return analysis.intent, analysis.scene
+    
+    @staticmethod
+    def _carry_over(context: List[dict]) -> dict:
+        # 最近一条带场景的AI回复，包含该轮的场景、岗位和关键词
+        for entry in reversed(context):
+            if entry.get('role') == 'assistant' and entry.get('scene'):
+                return entry
+        return {}
+    
+    def detect_scene(self, message: str) -> Optional[str]:
+        return self.analyze_message(message).scene
     
     def detect_position(self, message: str, user: User = None) -> Optional[str]:
+        return self.analyze_message(message, user).position
+    
+    def extract_keywords(self, message: str) -> List[str]:
+        return self.analyze_message(message).keywords
+    
+    def _position_from_user(self, user: User = None) -> Optional[str]:
         if user and user.role:
             role = user.role
             for position_name, keywords in self.POSITION_KEYWORDS.items():
                 if role in keywords:
                     return position_name
-        
-        message = message.lower()
-        for position, keywords in self.POSITION_KEYWORDS.items():
-            for keyword in keywords:
-                if keyword in message:
-                    return position
-        
         return None
     
-    def extract_keywords(self, message: str) -> List[str]:
-        # 优化的关键词提取逻辑
-        keywords = []
-        
-        # 预定义的核心词汇表
-        core_words = {
-            '需求', '沟通', '变更', '传递', '确认', '评审', '调研', '访谈', '对接', '咨询', '反馈', '澄清', '优先级',
-            '项目', '推进', '启动', '风险', '进度', '里程碑', '汇报', '任务', '分配', '协调', '资源', '计划', '目标',
-            'bug', 'Bug', '问题', '反馈', '修复', '验收', '分配', '协助', '异议', '优先级', '发现', '提交流程',
-            '客户', '接待', '投诉', '异议', '跟进', '寒暄', '拜访', '维护', '服务', '咨询', '沟通', '异议处理',
-            '售前', '产品经理', '项目经理', '前端', '后端', '测试', 'ui', '设计师',
-            '开发', '团队', '领导', '同事', '用户', '公司', '价格', '方案'
-        }
+    def _split_keywords(self, message: str, core_hits: List[str]) -> List[str]:
+        # 核心词汇之外，再按标点和空白切分出其他词汇
+        keywords = list(core_hits)
         
         # 移除标点符号和特殊字符
         clean_message = re.sub(r'[，。！？、；：""''（）【】《》\s]', ' ', message)
         
-        # 先尝试匹配核心词汇
-        for core_word in core_words:
-            if core_word in message:
-                keywords.append(core_word)
-        
-        # 按空格分割其他词汇
-        words = clean_message.split()
-        
         # 过滤停用词
-        stop_words = {'的', '了', '在', '是', '我', '有', '和', '就', '不', '人', '都', '一', '一个', '上', '也', '很', '到', '说', '要', '去', '你', '会', '着', '没有', '看', '好', '自己', '这', '如何', '应该', '怎么', '什么', '哪里', '可以', '需要', '想要', '希望', '了解', '知道', '觉得', '认为', '发现', '告诉', '提出', '描述', '开场', '结束'}
-        
-        for word in words:
-            if len(word) >= 2 and len(word) <= 6 and word not in stop_words and word not in keywords:
+        for word in clean_message.split():
+            if len(word) >= 2 and len(word) <= 6 and word not in self.STOP_WORDS and word not in keywords:
                 keywords.append(word)
         
         return keywords
@@ -197,74 +340,124 @@ class EnhancedAIService:
         scene_type: str = None,
         tone: str = None,
         limit: int = 5
+    ) -> List[ScriptResponse]:
+        """
+        单次查询的话术检索计划
+
+        只查询一次命中关键词的候选话术（仅取ID、岗位、场景、语气、使用次数），
+        在内存中把候选依次归入满足条件最多的层级：
+        岗位+场景+语气 → 岗位+语气 → 语气 → 仅关键词，
+        取第一个非空层级按相关度排序后加载前 limit 条。
+        无论命中与否都只需一次候选查询，命中时再加一次按ID加载。
+        
+        结果以 ScriptResponse 快照的形式按 (岗位, 分类, 场景, 语气, 关键词, 数量) 缓存，
+        相同条件的重复检索不再访问数据库。
+        """
+        keywords = [kw for kw in keywords or [] if len(kw) >= 2]
+        cache_key = (position, None, scene_type, tone, tuple(sorted(set(keywords))), limit)
+        version = catalog_version()
+        cached = _search_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+        
+        scripts = self._plan_search(keywords, position, scene_type, tone, limit)
+        result = [ScriptResponse.model_validate(script) for script in scripts]
+        _search_cache.set(cache_key, result, version=version)
+        return list(result)
+    
+    def _plan_search(
+        self,
+        keywords: List[str],
+        position: Optional[str],
+        scene_type: Optional[str],
+        tone: Optional[str],
+        limit: int
     ) -> List[Script]:
-        query = self.db.query(Script).filter(Script.is_active == True)
+        position_id = self._resolve_position_id(position) if position else None
+        keyword_sql, keyword_ids = keyword_filter(keywords, fields=TEXT_SEARCH_FIELDS)
+        if keyword_sql is None and keyword_ids is None:
+            return self._search_popular(position_id, scene_type, tone, limit)
+        
+        query = self.db.query(
+            Script.id, Script.position_id, Script.scene_type, Script.tone, Script.usage_count
+        ).filter(Script.is_active == True)
+        
+        if keyword_ids is not None:
+            # 内存索引命中过多时不拼入 SQL，取出有效话术后按命中ID和标签在内存中过滤
+            matched = or_(*[c for c in (keyword_sql, tag_condition(keywords)) if c is not None])
+            rows = query.add_columns(matched.label('matched')).all()
+            candidates = [c for c in rows if c.matched or c.id in keyword_ids]
+        else:
+            candidates = query.filter(or_(keyword_sql, tag_condition(keywords))).all()
+        if not candidates:
+            return []
         
-        if position:
-            pos = self.db.query(Position).filter(Position.name == position).first()
-            if pos:
-                query = query.filter(Script.position_id == pos.id)
-            else:
-                # 如果岗位名称不匹配，尝试使用position_id
-                try:
-                    position_id = int(position)
-                    query = query.filter(Script.position_id == position_id)
-                except ValueError:
-                    pass
+        toned = [c for c in candidates if c.tone == tone] if tone else candidates
+        positioned = [c for c in toned if c.position_id == position_id] if position_id is not None else toned
         
+        tiers = []
         if scene_type:
-            # 如果scene_type精确匹配不到，尝试模糊匹配
-            scene_match = query.filter(Script.scene_type == scene_type).first()
-            if scene_match:
-                query = query.filter(Script.scene_type == scene_type)
-            else:
-                # 尝试模糊匹配场景类型
-                scene_conditions = (
-                    Script.scene_type.like(f'%{scene_type}%') |
-                    Script.scene_type.contains(scene_type)
-                )
-                query = query.filter(scene_conditions)
-        
-        if tone:
-            query = query.filter(Script.tone == tone)
-        
-        if keywords:
-            keyword_conditions = []
-            for kw in keywords:
-                if len(kw) >= 2:
-                    keyword_conditions.append(
-                        (Script.title.like(f'%{kw}%') | 
-                         Script.content.like(f'%{kw}%') | 
-                         Script.tags.like(f'%{kw}%') |
-                         Script.brief_content.like(f'%{kw}%'))
-                    )
-            
-            if keyword_conditions:
-                query = query.filter(or_(*keyword_conditions))
-        
-        # 先按照使用次数排序，如果没有结果，就移除限制
-        scripts = query.order_by(Script.usage_count.desc()).limit(limit * 3).all()
-        
-        if not scripts:
-            # 如果没有结果，移除岗位和场景限制，只按关键词搜索
-            query = self.db.query(Script).filter(Script.is_active == True)
-            if keywords:
-                keyword_conditions = []
-                for kw in keywords:
-                    if len(kw) >= 2:
-                        keyword_conditions.append(
-                            (Script.title.like(f'%{kw}%') | 
-                             Script.content.like(f'%{kw}%') | 
-                             Script.tags.like(f'%{kw}%') |
-                             Script.brief_content.like(f'%{kw}%'))
-                        )
-                
-                if keyword_conditions:
-                    query = query.filter(or_(*keyword_conditions))
-            
-            scripts = query.order_by(Script.usage_count.desc()).limit(limit).all()
+            # 场景优先精确匹配，精确匹配不到时再按包含关系模糊匹配
+            tiers.append(
+                [c for c in positioned if c.scene_type == scene_type]
+                or [c for c in positioned if scene_type in (c.scene_type or '')]
+            )
+        tiers.extend([positioned, toned, candidates])
         
-        return scripts[:limit]
+        tier = next(t for t in tiers + [[]] if t)
+        return self._load_scripts(self._rank_candidates(tier, keywords)[:limit])
+    
+    def _search_popular(
+        self,
+        position_id: Optional[int],
+        scene_type: Optional[str],
+        tone: Optional[str],
+        limit: int
+    ) -> List[Script]:
+        # 没有关键词时不取出全部有效话术：在 SQL 中按与 _plan_search 相同的层级给话术打分，
+        # 只取层级最高、使用次数最多的 limit 条，再保留其中处于最高层级的话术
+        toned = Script.tone == tone if tone else true()
+        positioned = and_(toned, Script.position_id == position_id) if position_id is not None else toned
+        tiers = []
+        if scene_type:
+            tiers.append((and_(positioned, Script.scene_type == scene_type), 4))
+            tiers.append((and_(positioned, Script.scene_type.contains(scene_type, autoescape=True)), 3))
+        tiers.extend([(positioned, 2), (toned, 1)])
+        tier = case(*tiers, else_=0)
+        
+        rows = self.db.query(Script, tier.label('tier')).filter(Script.is_active == True).order_by(
+            tier.desc(), func.coalesce(Script.usage_count, 0).desc(), Script.id.asc()
+        ).limit(limit).all()
+        if not rows:
+            return []
+        return [script for script, script_tier in rows if script_tier == rows[0].tier]
+    
+    def _rank_candidates(self, candidates, keywords: List[str]) -> List[int]:
+        # 有关键词时按 BM25 与使用次数综合打分，否则按使用次数排序
+        rows = [(c.id, c.usage_count) for c in candidates]
+        if keywords and script_index.ready:
+            return rank_script_ids(rows, keywords)
+        return [sid for sid, _ in sorted(rows, key=lambda r: (r[1] or 0, -r[0]), reverse=True)]
+    
+    def _resolve_position_id(self, position: str) -> Optional[int]:
+        # 岗位名称到ID的映射很少变化，首次使用时整表加载并缓存在类上
+        if EnhancedAIService._position_ids is None:
+            EnhancedAIService._position_ids = {
+                name: pid for pid, name in self.db.query(Position.id, Position.name).all()
+            }
+        if position in EnhancedAIService._position_ids:
+            return EnhancedAIService._position_ids[position]
+        # 如果岗位名称不匹配，尝试使用position_id
+        try:
+            return int(position)
+        except ValueError:
+            return None
+    
+    def _load_scripts(self, script_ids: List[int]) -> List[Script]:
+        if not script_ids:
+            return []
+        scripts = {s.id: s for s in self.db.query(Script).filter(Script.id.in_(script_ids)).all()}
+        return [scripts[sid] for sid in script_ids if sid in scripts]
     
     def generate_response_based_on_scene(
         self,
@@ -272,12 +465,14 @@ class EnhancedAIService:
         detected_scene: str,
         position: str = None,
         tone: str = None,
-        length: str = None
-    ) -> Tuple[str, List[Script]]:
+        length: str = None,
+        keywords: List[str] = None
+    ) -> Tuple[str, List[ScriptResponse]]:
         
-        keywords = self.extract_keywords(message)
+        if keywords is None:
+            keywords = self.extract_keywords(message)
         
-        # 先尝试匹配场景
+        # 检索计划依次退化：岗位+场景 → 岗位 → 不限岗位 → 仅关键词
         scripts = self.search_scripts(
             keywords=keywords,
             position=position,
@@ -286,23 +481,6 @@ class EnhancedAIService:
             limit=5
         )
         
-        # 如果没有找到，尝试只根据关键词搜索，不限制场景
-        if not scripts:
-            scripts = self.search_scripts(
-                keywords=keywords,
-                position=position,
-                tone=tone,
-                limit=5
-            )
-        
-        # 如果还是没有找到，尝试不限制岗位
-        if not scripts:
-            scripts = self.search_scripts(
-                keywords=keywords,
-                tone=tone,
-                limit=5
-            )
-        
         if scripts:
             reply = self._generate_scene_response(detected_scene, scripts, position)
             return reply, scripts
@@ -313,7 +491,7 @@ class EnhancedAIService:
     def _generate_scene_response(
         self, 
         scene: str, 
-        scripts: List[Script], 
+        scripts: List[ScriptResponse], 
         position: str = None
     ) -> str:
         scene_messages = {
@@ -362,9 +540,9 @@ class EnhancedAIService:
         
         if tone and tone in self.TONE_ADJUSTMENTS:
             tone_rules = self.TONE_ADJUSTMENTS[tone]
-            for old, new in tone_rules.items():
-                if old not in ['prefix', 'suffix']:
-                    adjusted_content = adjusted_content.replace(old, new)
+            pattern, table = self._TONE_REWRITERS[tone]
+            if pattern is not None:
+                adjusted_content = pattern.sub(lambda m: table[m.group()], adjusted_content)
             
             prefix = tone_rules.get('prefix', '')
             suffix = tone_rules.get('suffix', '')
@@ -380,8 +558,8 @@ class EnhancedAIService:
             suffix = length_rule['suffix']
             
             if ratio < 1.0:
-                sentences = re.split(r'[。！？\n]', adjusted_content)
-                adjusted_content = sentences[0] + '。' + suffix
+                first_sentence = _SENTENCE_SPLIT_PATTERN.split(adjusted_content, maxsplit=1)[0]
+                adjusted_content = first_sentence + '。' + suffix
             elif ratio > 1.0:
                 adjusted_content += "\n\n补充说明：如果您需要更详细的沟通方案，可以根据具体情况调整话术的细节部分，确保沟通效果最佳。" + suffix
             else:
@@ -390,19 +568,20 @@ class EnhancedAIService:
         
         return adjusted_content
     
-    def generate_chat_response(
+    # 不需要话术数据的意图，直接返回固定回复
+    SMALL_TALK_INTENTS = ('greeting', 'thank', 'goodbye', 'ask_position')
+    
+    def small_talk_response(
         self,
-        message: str,
+        analysis: MessageAnalysis,
         user: User = None,
-        session_id: str = None,
-        position: str = None,
-        tone: str = None,
-        length: str = None,
-        context: List[dict] = None
-    ) -> ChatResponse:
-        intent, _ = self.detect_intent(message, context)
+        session_id: str = None
+    ) -> Optional[ChatResponse]:
+        """问候、感谢、告别、询问岗位等意图的固定回复，不访问数据库；其他意图返回 None"""
+        if analysis.intent not in self.SMALL_TALK_INTENTS:
+            return None
         
-        if intent == 'greeting':
+        if analysis.intent == 'greeting':
             reply = self.generate_greeting(user)
             return ChatResponse(
                 reply=reply,
@@ -411,7 +590,7 @@ class EnhancedAIService:
                 intent='greeting'
             )
         
-        if intent == 'thank':
+        if analysis.intent == 'thank':
             reply = "不客气！还有其他需要帮助的吗？我可以帮您生成各种沟通话术~"
             return ChatResponse(
                 reply=reply,
@@ -420,7 +599,7 @@ class EnhancedAIService:
                 intent='thank'
             )
         
-        if intent == 'goodbye':
+        if analysis.intent == 'goodbye':
             reply = "好的，再见！有问题随时找我，祝您工作顺利~"
             return ChatResponse(
                 reply=reply,
@@ -429,7 +608,7 @@ class EnhancedAIService:
                 intent='goodbye'
             )
         
-        if intent == 'ask_position':
+        if analysis.intent == 'ask_position':
             reply = "您可以选择以下岗位，我会为您推荐更精准的话术：\n\n👤 售前人员\n📊 项目经理\n📱 产品经理\n🎨 前端开发\n⚙️ 后端开发\n🖼️ UI设计师\n🔍 测试工程师\n\n请告诉我您的岗位，或者描述具体的沟通场景！"
             return ChatResponse(
                 reply=reply,
@@ -438,8 +617,86 @@ class EnhancedAIService:
                 intent='ask_position'
             )
         
-        detected_position = self.detect_position(message, user) or position
-        detected_scene = self.detect_scene(message)
+        return None
+    
+    def answer(
+        self,
+        message: str,
+        user: User = None,
+        session_id: str = None,
+        position: str = None,
+        tone: str = None,
+        length: str = None,
+        context: List[dict] = None,
+        analysis: MessageAnalysis = None
+    ) -> Tuple[ChatResponse, MessageAnalysis]:
+        """
+        生成聊天回复，相同请求直接返回缓存的结果
+
+        缓存键为规范化后的消息、用户岗位、指定岗位、实际生效的语气和长度，以及上下文中可沿用的
+        场景、岗位和关键词；命中时跳过意图识别和话术检索，只替换会话ID。
+        只缓存检索类回复，问候、感谢等固定回复无需缓存。
+        传入 analysis（可以尚未结合上下文）时不再重新扫描消息，未命中缓存时才结合上下文补全。
+
+        Returns:
+            (回复, 消息识别结果)
+        """
+        carry = self._carry_over(context) if context else {}
+        key = (
+            normalize_message(message),
+            self._position_from_user(user),
+            position,
+            tone or (user.tone_preference if user else '温和'),
+            length or (user.length_preference if user else '标准版'),
+            carry.get('scene'),
+            carry.get('position'),
+            tuple(carry.get('keywords') or ()),
+        )
+        version = catalog_version()
+        cached = _response_cache.get(key)
+        if cached is not None:
+            response, cached_analysis = cached
+            return response.model_copy(update={'session_id': session_id or ''}), cached_analysis
+        
+        if analysis is None:
+            analysis = self.analyze_message(message, user, context)
+        else:
+            analysis = self.apply_context(analysis, context)
+        response = self.generate_chat_response(
+            message=message,
+            user=user,
+            session_id=session_id,
+            position=position,
+            tone=tone,
+            length=length,
+            context=context,
+            analysis=analysis
+        )
+        if response.intent == 'search':
+            _response_cache.set(key, (response, analysis), version=version)
+        return response, analysis
+    
+    def generate_chat_response(
+        self,
+        message: str,
+        user: User = None,
+        session_id: str = None,
+        position: str = None,
+        tone: str = None,
+        length: str = None,
+        context: List[dict] = None,
+        analysis: MessageAnalysis = None
+    ) -> ChatResponse:
+        # 流式接口会先行识别并推送意图，此时直接复用识别结果
+        if analysis is None:
+            analysis = self.analyze_message(message, user)
+        
+        response = self.small_talk_response(analysis, user, session_id)
+        if response is not None:
+            return response
+        
+        detected_position = analysis.position or position
+        detected_scene = analysis.scene
         
         user_tone = user.tone_preference if user else '温和'
         user_length = user.length_preference if user else '标准版'
@@ -450,18 +707,14 @@ class EnhancedAIService:
                 detected_scene=detected_scene,
                 position=detected_position,
                 tone=tone or user_tone,
-                length=length or user_length
+                length=length or user_length,
+                keywords=analysis.keywords
             )
             
             if scripts:
-                script_list = [
-                    ScriptResponse.model_validate(script) 
-                    for script in scripts
-                ]
-                
                 return ChatResponse(
                     reply=reply,
-                    scripts=script_list,
+                    scripts=scripts,
                     session_id=session_id or '',
                     intent='search'
                 )
@@ -473,27 +726,21 @@ class EnhancedAIService:
                     intent='search'
                 )
         else:
-            keywords = self.extract_keywords(message)
             scripts = self.search_scripts(
-                keywords=keywords,
+                keywords=analysis.keywords,
                 position=detected_position,
                 tone=tone or user_tone,
                 limit=5
             )
             
             if scripts:
-                script_list = [
-                    ScriptResponse.model_validate(script) 
-                    for script in scripts
-                ]
-                
                 reply = f"为您找到了{len(scripts)}条相关话术："
                 if detected_position:
                     reply += f"\n\n针对【{detected_position}】岗位："
                 
                 return ChatResponse(
                     reply=reply,
-                    scripts=script_list,
+                    scripts=scripts,
                     session_id=session_id or '',
                     intent='search'
                 )
@@ -512,6 +759,20 @@ class EnhancedAIService:
         tone: str = None,
         length_type: str = None
     ) -> ScriptAdjustResponse:
+        # 优先按主键读取预先生成的变体；未知语气不做语气调整，未知长度与标准版结果相同
+        variant = self.db.get(ScriptVariant, (
+            script_id,
+            tone if tone in self.TONE_ADJUSTMENTS else '',
+            length_type if length_type in self.LENGTH_ADJUSTMENTS else '标准版'
+        ))
+        if variant is not None:
+            return ScriptAdjustResponse(
+                original_content=variant.original_content,
+                adjusted_content=variant.adjusted_content,
+                tone=tone,
+                length_type=length_type
+            )
+        
         script = self.db.query(Script).filter(Script.id == script_id).first()
         if not script:
             raise ValueError("话术不存在")
@@ -529,6 +790,48 @@ class EnhancedAIService:
             length_type=length_type
         )
     
+    def adjust_scripts(
+        self,
+        script_ids: List[int],
+        tone: str = None,
+        length_type: str = None
+    ) -> List[ScriptAdjustBatchItem]:
+        """批量调整话术，一次 IN 查询读取全部变体；按传入顺序返回，不存在的话术不返回"""
+        script_ids = list(dict.fromkeys(script_ids))
+        variants = {
+            variant.script_id: variant
+            for variant in self.db.query(ScriptVariant).filter(
+                ScriptVariant.script_id.in_(script_ids),
+                ScriptVariant.tone == (tone if tone in self.TONE_ADJUSTMENTS else ''),
+                ScriptVariant.length_type == (length_type if length_type in self.LENGTH_ADJUSTMENTS else '标准版')
+            )
+        }
+        contents = {
+            script_id: (variant.original_content, variant.adjusted_content)
+            for script_id, variant in variants.items()
+        }
+        
+        # 尚未生成变体的话术（如直接写库新增的）再查一次话术表，现场调整
+        missing = [script_id for script_id in script_ids if script_id not in variants]
+        if missing:
+            for script in self.db.query(Script).filter(Script.id.in_(missing)):
+                original_content = script.content
+                if length_type == '简洁版' and script.brief_content:
+                    original_content = script.brief_content
+                contents[script.id] = (original_content, self.adjust_script_content(original_content, tone, length_type))
+        
+        return [
+            ScriptAdjustBatchItem(
+                script_id=script_id,
+                original_content=contents[script_id][0],
+                adjusted_content=contents[script_id][1],
+                tone=tone,
+                length_type=length_type
+            )
+            for script_id in script_ids
+            if script_id in contents
+        ]
+    
     def save_conversation(
         self,
         user_id: int,
@@ -551,15 +854,27 @@ class EnhancedAIService:
         self.db.add(conversation)
         self.db.commit()
         self.db.refresh(conversation)
+        session_context.append(user_id, session_id, context_entry(message_type, content, intent, context_data))
         return conversation
     
+    def get_session_context(self, user_id: int, session_id: str) -> List[dict]:
+        """获取会话最近几轮的上下文，按时间从早到晚排列，仅在缓存未命中时查询数据库"""
+        return session_context.get(
+            user_id,
+            session_id,
+            lambda limit: [
+                context_entry(c.message_type, c.content, c.intent, c.context_data)
+                for c in reversed(self.get_conversation_history(user_id, session_id, limit=limit))
+            ]
+        )
+    
     def get_conversation_history(
         self,
         user_id: int,
         session_id: str,
         limit: int = 10
     ) -> List[Conversation]:
-        return (
+        history = (
             self.db.query(Conversation)
             .filter(
                 Conversation.user_id == user_id,
@@ -569,6 +884,17 @@ class EnhancedAIService:
             .limit(limit)
             .all()
         )
+        
+        # 合并写入队列中尚未落库的记录，这些记录比库中的更新
+        pending = conversation_log.pending(user_id, session_id)
+        if pending:
+            written = {(c.message_type, c.created_at) for c in history}
+            history += [
+                Conversation(**row) for row in pending
+                if (row['message_type'], row['created_at']) not in written
+            ]
+            history = sorted(history, key=lambda c: c.created_at, reverse=True)[:limit]
+        return history
     
     def get_recommended_scripts(
         self,
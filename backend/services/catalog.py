@@ -0,0 +1,109 @@
+"""
+话术目录变更跟踪模块
+
+监听 Script 表的 ORM 写入，维护全局的目录版本号，并把变更通知给订阅者
+（检索索引、结果缓存等进程内派生数据）。
+flush 时只把变更记录在会话的 info 中，事务提交后才通知订阅者并递增版本号，
+回滚时丢弃，进程内派生数据不会领先于数据库中已提交的数据。
+
+主要内容：
+- catalog_version(): 当前目录版本号，任何话术内容变更都会使其递增
+- on_script_change(): 订阅话术变更，回调参数为 (操作类型, 话术字段快照)
+
+说明：
+- 只统计影响检索结果的字段变更；仅 usage_count、like_count 变化的更新不会递增版本号，
+  避免每次查看、点赞都让缓存失效
+- 通过 sqlite3 直接写库的脚本不会触发通知，导入后需要重启服务
+"""
+
+import threading
+from types import SimpleNamespace
+from typing import Callable, List
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+from models.database import Script
+
+# 不影响检索结果的统计类字段
+_COUNTER_FIELDS = {'usage_count', 'like_count', 'updated_at'}
+CATALOG_FIELDS = tuple(c.key for c in Script.__table__.columns if c.key not in _COUNTER_FIELDS)
+# 通知订阅者时携带的字段，提交后 ORM 对象可能已过期，因此在 flush 时取值
+_SNAPSHOT_FIELDS = CATALOG_FIELDS + ('usage_count',)
+# session.info 中暂存未提交变更的键
+_PENDING_KEY = 'catalog_changes'
+
+_version = 0
+_lock = threading.Lock()
+_listeners: List[Callable[[str, Script], None]] = []
+
+
+def catalog_version() -> int:
+    """获取当前话术目录版本号"""
+    return _version
+
+
+def bump_catalog_version() -> int:
+    """递增话术目录版本号，返回新的版本号"""
+    global _version
+    with _lock:
+        _version += 1
+        return _version
+
+
+def on_script_change(callback: Callable[[str, SimpleNamespace], None]):
+    """
+    订阅话术变更
+
+    Args:
+        callback: 回调函数，参数为操作类型（insert/update/delete）和话术字段快照
+                  （属性名与 Script 相同），在事务提交后同步调用
+    """
+    _listeners.append(callback)
+    return callback
+
+
+def _record(action: str, target: Script):
+    snapshot = SimpleNamespace(**{field: getattr(target, field) for field in _SNAPSHOT_FIELDS})
+    session = object_session(target)
+    if session is None:
+        _notify([(action, snapshot)])
+    else:
+        session.info.setdefault(_PENDING_KEY, []).append((action, snapshot))
+
+
+def _notify(changes: list):
+    # 先更新派生数据再递增版本号，新版本号下计算的结果一定基于已更新的索引
+    for action, snapshot in changes:
+        for callback in _listeners:
+            callback(action, snapshot)
+    bump_catalog_version()
+
+
+@event.listens_for(Script, 'after_insert')
+def _after_insert(mapper, connection, target):
+    _record('insert', target)
+
+
+@event.listens_for(Script, 'after_update')
+def _after_update(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in CATALOG_FIELDS):
+        _record('update', target)
+
+
+@event.listens_for(Script, 'after_delete')
+def _after_delete(mapper, connection, target):
+    _record('delete', target)
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    changes = session.info.pop(_PENDING_KEY, None)
+    if changes:
+        _notify(changes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _after_rollback(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,208 @@
+"""
+对话记录异步写入模块
+
+聊天接口不再逐条 add/commit 对话记录，而是把记录放入内存队列后立即返回，
+由后台任务按批量（达到条数或等待超时）使用 executemany 一次性写入 conversations 表。
+
+主要内容：
+- ConversationLog: 有界写入队列及后台刷盘任务
+- conversation_log: 全局实例，应用启动时 start()，关闭时 stop() 把剩余记录全部写入
+
+说明：
+- 队列容量有上限，写满后按 CONVERSATION_LOG_OVERFLOW 处理：block 等待后台写入腾出空间，
+  drop 丢弃新记录并计数
+- 尚未写入的记录通过 pending() 提供给历史查询合并，保证同一会话能读到刚发送的消息
+- 记录被接收后才更新内存中的会话上下文，drop 策略下被丢弃的记录不会出现在上下文中
+- 写入失败（如 database is locked）时按退避间隔重试，最多 CONVERSATION_LOG_MAX_RETRIES 次，
+  重试期间记录仍保留在 pending() 中；重试耗尽后才丢弃并计数
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+
+from config import get_settings
+from models.database import Conversation, async_engine
+from services.session_context import context_entry, session_context
+
+settings = get_settings()
+
+
+class ConversationLog:
+    """
+    对话记录的写后队列
+
+    Args:
+        batch_size: 单次批量写入的最大条数，队列中积累到该数量时立即写入
+        flush_interval: 最长等待时间（秒），不足一批时到时也会写入
+        max_pending: 队列容量上限
+        overflow: 队列已满时的处理策略，block 或 drop
+        max_retries: 单批写入失败后的最大重试次数
+    """
+
+    # 第 n 次重试前等待 RETRY_DELAY * 2 ** (n - 1) 秒
+    RETRY_DELAY = 0.2
+
+    def __init__(
+        self,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_pending: int = 10000,
+        overflow: str = "block",
+        max_retries: int = 3
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.overflow = overflow
+        self.max_retries = max_retries
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        # (user_id, session_id) -> 已入队但尚未写入的记录
+        self._pending: Dict[Tuple[int, str], List[dict]] = {}
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.blocked = 0
+        self.retried = 0
+        self.failed = 0
+
+    def start(self):
+        """在当前事件循环中启动后台写入任务"""
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._stopping = False
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """停止接收新记录，等待队列中的记录全部写入"""
+        if self._task is None:
+            return
+        self._stopping = True
+        await self._task
+        self._task = None
+        self._queue = None
+
+    async def append(
+        self,
+        user_id: int,
+        session_id: str,
+        message_type: str,
+        content: str,
+        context_data: dict = None,
+        intent: str = None,
+        referenced_script_id: int = None,
+        created_at: datetime = None
+    ) -> bool:
+        """
+        追加一条对话记录
+
+        Returns:
+            bool: 是否被接收，drop 策略下队列已满时返回 False
+        """
+        row = {
+            'user_id': user_id,
+            'session_id': session_id,
+            'message_type': message_type,
+            'content': content,
+            'context_data': context_data,
+            'intent': intent,
+            'referenced_script_id': referenced_script_id,
+            # 入队时记录时间，保证批量写入后的顺序与实际发送顺序一致
+            'created_at': created_at or datetime.now(),
+        }
+        entry = context_entry(message_type, content, intent, context_data)
+        if self._queue is None or self._stopping:
+            written = await self._write([row])
+            if written:
+                session_context.append(user_id, session_id, entry)
+            return written
+
+        if self._queue.full():
+            if self.overflow == "drop":
+                self.dropped += 1
+                return False
+            self.blocked += 1
+        session_context.append(user_id, session_id, entry)
+        self._pending.setdefault((user_id, session_id), []).append(row)
+        await self._queue.put(row)
+        return True
+
+    def pending(self, user_id: int, session_id: str) -> List[dict]:
+        """返回该会话已入队但尚未写入数据库的记录"""
+        return list(self._pending.get((user_id, session_id), ()))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while not (self._stopping and self._queue.empty()):
+            batch = []
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0 or self._stopping:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            if batch:
+                await self._write(batch)
+
+    async def _write(self, rows: List[dict]) -> bool:
+        """批量写入，失败时退避重试，返回是否写入成功"""
+        try:
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    self.retried += 1
+                    await asyncio.sleep(self.RETRY_DELAY * 2 ** (attempt - 1))
+                try:
+                    async with async_engine.begin() as conn:
+                        await conn.execute(insert(Conversation.__table__), rows)
+                except Exception as e:
+                    error = e
+                    continue
+                self.written += len(rows)
+                self.batches += 1
+                return True
+            self.failed += len(rows)
+            print(f"对话记录批量写入失败，已重试 {self.max_retries} 次，丢弃 {len(rows)} 条: {error}")
+            return False
+        finally:
+            for row in rows:
+                key = (row['user_id'], row['session_id'])
+                pending = self._pending.get(key)
+                if pending is None:
+                    continue
+                pending[:] = [r for r in pending if r is not row]
+                if not pending:
+                    del self._pending[key]
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "pending": sum(len(rows) for rows in self._pending.values()),
+            "max_pending": self.max_pending,
+            "overflow": self.overflow,
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "blocked": self.blocked,
+            "retried": self.retried,
+            "failed": self.failed,
+        }
+
+
+conversation_log = ConversationLog(
+    batch_size=settings.CONVERSATION_LOG_BATCH_SIZE,
+    flush_interval=settings.CONVERSATION_LOG_FLUSH_INTERVAL,
+    max_pending=settings.CONVERSATION_LOG_MAX_PENDING,
+    overflow=settings.CONVERSATION_LOG_OVERFLOW,
+    max_retries=settings.CONVERSATION_LOG_MAX_RETRIES
+)
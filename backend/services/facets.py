@@ -0,0 +1,243 @@
+"""
+话术分面索引模块
+
+为 position_id、category_id、scene_type、tone、is_free、is_active 六个字段的每个取值
+维护一个位图（以 Python 整数表示），第 N 位代表第 N 个话术槽位。组合筛选通过位图
+按位与/或完成，总数和各分面取值的数量通过统计置位数得到，无需执行 COUNT(*)。
+同时保存每条话术的使用次数（随 script_counters 批量写入同步），话术列表可直接由筛选位图
+得到候选话术并在内存中排序分页。
+
+主要内容：
+- ScriptFacetIndex: 分面位图索引，usage_rows() 把筛选位图展开为候选话术
+- script_facets: 全局实例，应用启动时从 Script 表构建，并随话术目录变更增量更新
+"""
+
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from models.database import Script
+from services.catalog import on_script_change
+from services.script_counters import on_counts_flushed
+
+# 参与分面统计的字段
+FACET_FIELDS = ('position_id', 'category_id', 'scene_type', 'tone', 'is_free', 'is_active')
+BOOLEAN_FIELDS = {'is_free', 'is_active'}
+
+try:
+    _popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def _popcount(bitmap: int) -> int:
+        return bin(bitmap).count('1')
+
+
+def _bitmap_from_slots(slots: Iterable[int]) -> int:
+    # 先在字节数组中置位再一次性转换为整数，避免逐位或运算反复复制大整数
+    slots = list(slots)
+    if not slots:
+        return 0
+    buf = bytearray((max(slots) >> 3) + 1)
+    for slot in slots:
+        buf[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(buf, 'little')
+
+
+def _slots_from_bitmap(bitmap: int) -> List[int]:
+    # 按字节展开置位，跳过全零字节，避免对大整数逐位移位
+    buf = bitmap.to_bytes((bitmap.bit_length() + 7) >> 3, 'little')
+    return [
+        (i << 3) + bit
+        for i, byte in enumerate(buf) if byte
+        for bit in range(8) if byte >> bit & 1
+    ]
+
+
+class ScriptFacetIndex:
+    """话术分面位图索引"""
+
+    def __init__(self, fields: Iterable[str] = FACET_FIELDS):
+        self.fields = tuple(fields)
+        self.ready = False
+        self._lock = threading.RLock()
+        # script_id -> 槽位；槽位 -> script_id，删除后槽位回收复用
+        self._slots: Dict[int, int] = {}
+        self._slot_ids: List[Optional[int]] = []
+        self._free_slots: List[int] = []
+        # script_id -> {字段名: 取值}
+        self._values: Dict[int, Dict[str, Any]] = {}
+        # script_id -> 使用次数，用于按使用次数或相关度排序候选话术
+        self._usage: Dict[int, int] = {}
+        # 字段名 -> {取值: 位图}
+        self._bitmaps: Dict[str, Dict[Any, int]] = {f: {} for f in self.fields}
+        self._all = 0
+
+    def build(self, db: Session) -> int:
+        """从 Script 表全量构建位图，返回话术数量"""
+        rows = db.query(
+            Script.id, Script.usage_count, *[getattr(Script, f) for f in self.fields]
+        ).order_by(Script.id).all()
+        value_slots: Dict[str, Dict[Any, List[int]]] = {f: {} for f in self.fields}
+        values_by_id: Dict[int, Dict[str, Any]] = {}
+        for slot, row in enumerate(rows):
+            values = {f: self._normalize(f, v) for f, v in zip(self.fields, row[2:])}
+            values_by_id[row[0]] = values
+            for field, value in values.items():
+                value_slots[field].setdefault(value, []).append(slot)
+
+        with self._lock:
+            self._slot_ids = [row[0] for row in rows]
+            self._slots = {sid: slot for slot, sid in enumerate(self._slot_ids)}
+            self._free_slots = []
+            self._values = values_by_id
+            self._usage = {row[0]: row[1] or 0 for row in rows}
+            self._bitmaps = {
+                field: {value: _bitmap_from_slots(slots) for value, slots in by_value.items()}
+                for field, by_value in value_slots.items()
+            }
+            self._all = (1 << len(rows)) - 1
+            self.ready = True
+        return len(rows)
+
+    def add(self, script_id: int, values: Dict[str, Any], usage_count: int = 0):
+        """新增或替换一条话术的分面取值"""
+        with self._lock:
+            self._remove(script_id)
+            self._add(script_id, values)
+            self._usage[script_id] = usage_count or 0
+
+    def remove(self, script_id: int):
+        with self._lock:
+            self._remove(script_id)
+
+    def _add(self, script_id: int, values: Dict[str, Any]):
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            self._slot_ids[slot] = script_id
+        else:
+            slot = len(self._slot_ids)
+            self._slot_ids.append(script_id)
+        self._slots[script_id] = slot
+        bit = 1 << slot
+        self._all |= bit
+
+        values = {f: self._normalize(f, values.get(f)) for f in self.fields}
+        self._values[script_id] = values
+        for field, value in values.items():
+            bitmaps = self._bitmaps[field]
+            bitmaps[value] = bitmaps.get(value, 0) | bit
+
+    def _remove(self, script_id: int):
+        slot = self._slots.pop(script_id, None)
+        if slot is None:
+            return
+        mask = ~(1 << slot)
+        self._all &= mask
+        self._usage.pop(script_id, None)
+        for field, value in self._values.pop(script_id).items():
+            bitmaps = self._bitmaps[field]
+            bitmaps[value] &= mask
+            if not bitmaps[value]:
+                del bitmaps[value]
+        self._slot_ids[slot] = None
+        self._free_slots.append(slot)
+
+    @staticmethod
+    def _normalize(field: str, value: Any) -> Any:
+        # 布尔字段在 SQLite 中以 0/1 存储，统一转为 bool，保证输出类型一致
+        if field in BOOLEAN_FIELDS and value is not None:
+            return bool(value)
+        return value
+
+    def _field_bitmap(self, field: str, value: Any) -> int:
+        if isinstance(value, (list, tuple, set)):
+            bitmap = 0
+            for v in value:
+                bitmap |= self._bitmaps[field].get(v, 0)
+            return bitmap
+        return self._bitmaps[field].get(value, 0)
+
+    def bitmap(self, filters: Dict[str, Any], exclude: Optional[str] = None) -> int:
+        """
+        计算筛选条件对应的位图
+
+        不同字段之间按位与，同一字段传入多个取值（列表）时按位或。
+
+        Args:
+            filters: {字段名: 取值或取值列表}
+            exclude: 计算时忽略的字段，用于统计该字段自身的分面数量
+        """
+        with self._lock:
+            bitmap = self._all
+            for field, value in filters.items():
+                if field == exclude:
+                    continue
+                bitmap &= self._field_bitmap(field, value)
+                if not bitmap:
+                    break
+            return bitmap
+
+    def bitmap_of(self, script_ids: Iterable[int]) -> int:
+        """把话术ID集合转换为位图，不在索引中的ID被忽略"""
+        with self._lock:
+            slots = (self._slots.get(sid) for sid in script_ids)
+            return _bitmap_from_slots(slot for slot in slots if slot is not None)
+
+    def add_usage(self, deltas: Dict[int, int]):
+        """累加话术的使用次数"""
+        with self._lock:
+            for script_id, delta in deltas.items():
+                if script_id in self._usage:
+                    self._usage[script_id] += delta
+
+    def usage_rows(self, bitmap: int) -> List[Tuple[int, int]]:
+        """返回位图中话术的 (话术ID, 使用次数) 列表"""
+        with self._lock:
+            return [
+                (sid, self._usage.get(sid, 0))
+                for sid in (self._slot_ids[slot] for slot in _slots_from_bitmap(bitmap))
+            ]
+
+    def count(self, bitmap: int) -> int:
+        return _popcount(bitmap)
+
+    def counts(self, filters: Dict[str, Any], base: int = -1, fields: Iterable[str] = None) -> Dict[str, Dict[Any, int]]:
+        """
+        统计各分面取值的话术数量
+
+        统计某个字段时不应用该字段自身的筛选条件，这样已选中的分面仍能显示其他取值的数量。
+
+        Args:
+            filters: 当前筛选条件
+            base: 额外限定的位图（如关键词命中的话术），默认不限定
+            fields: 需要统计的字段，默认全部分面字段
+        """
+        result: Dict[str, Dict[Any, int]] = {}
+        with self._lock:
+            for field in fields or self.fields:
+                scope = self.bitmap(filters, exclude=field) & base
+                result[field] = {
+                    value: n
+                    for value, bitmap in self._bitmaps[field].items()
+                    if (n := _popcount(bitmap & scope))
+                }
+        return result
+
+
+script_facets = ScriptFacetIndex()
+
+
+@on_script_change
+def _sync_facets(action: str, script):
+    if not script_facets.ready:
+        return
+    if action == 'delete':
+        script_facets.remove(script.id)
+    else:
+        script_facets.add(script.id, {f: getattr(script, f) for f in script_facets.fields}, script.usage_count)
+
+
+@on_counts_flushed
+def _sync_facets_usage(deltas: Dict[int, Dict[str, int]]):
+    if script_facets.ready:
+        script_facets.add_usage({sid: d['usage_count'] for sid, d in deltas.items() if d.get('usage_count')})
@@ -0,0 +1,182 @@
+"""
+话术计数器聚合模块
+
+查看话术、点赞不再逐次读取-修改-提交 usage_count / like_count，而是在内存中按话术累加增量，
+由后台任务定时用一条批量 UPDATE（usage_count = usage_count + ?）写入，应用关闭时写入剩余增量。
+新的点赞记录与点赞数增量在同一事务中批量写入 script_likes 表。
+
+主要内容：
+- ScriptCounters: 计数增量聚合及后台刷盘任务
+- script_counters: 全局实例，应用启动时 start()，关闭时 stop()
+- on_counts_flushed(): 订阅写入成功的计数增量，回调参数为 {script_id: {字段: 增量}}
+
+说明：
+- 增量在数据库中原子累加，并发请求不会丢失计数，也不再每次请求占用写锁
+- 尚未写入的增量通过 pending() 提供给接口，返回的计数包含刚发生的操作；
+  尚未写入的点赞记录通过 pending_likes() 提供给点赞去重
+- 计数更新走 Core UPDATE，不触发话术目录变更；输入联想、分面索引中的使用次数
+  通过 on_counts_flushed() 在每次写入成功后同步
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import bindparam, insert, update
+
+from config import get_settings
+from models.database import Script, ScriptLike, async_engine
+
+settings = get_settings()
+
+scripts_table = Script.__table__
+script_likes_table = ScriptLike.__table__
+
+COUNTER_FIELDS = ('usage_count', 'like_count')
+
+_listeners: List[Callable[[Dict[int, Dict[str, int]]], None]] = []
+
+
+def on_counts_flushed(callback: Callable[[Dict[int, Dict[str, int]]], None]):
+    """
+    订阅写入成功的计数增量
+
+    Args:
+        callback: 回调函数，参数为 {script_id: {字段: 增量}}，在写入事务提交后同步调用
+    """
+    _listeners.append(callback)
+    return callback
+
+
+class ScriptCounters:
+    """
+    话术计数增量聚合器
+
+    Args:
+        flush_interval: 写入间隔（秒）
+    """
+
+    def __init__(self, flush_interval: float = 5.0):
+        self.flush_interval = flush_interval
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+        # script_id -> {字段: 增量}
+        self._deltas: Dict[int, Dict[str, int]] = {}
+        # 正在写入的增量，写入完成前仍计入 pending()
+        self._flushing: Dict[int, Dict[str, int]] = {}
+        # 待写入和正在写入的点赞记录
+        self._likes: List[dict] = []
+        self._flushing_likes: List[dict] = []
+        self._busy = False
+        self.flushed = 0
+        self.batches = 0
+        self.failed = 0
+
+    def start(self):
+        """在当前事件循环中启动后台写入任务"""
+        if self._task is not None:
+            return
+        self._stopping = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """停止后台任务并写入剩余增量"""
+        if self._task is None:
+            return
+        self._stopping.set()
+        await self._task
+        self._task = None
+        await self.flush()
+
+    async def add(self, script_id: int, field: str, delta: int = 1):
+        """
+        累加一条话术的计数
+
+        Args:
+            field: usage_count 或 like_count
+        """
+        counters = self._deltas.setdefault(script_id, {})
+        counters[field] = counters.get(field, 0) + delta
+        if self._task is None:
+            await self.flush()
+
+    async def add_like(self, user_id: int, script_id: int):
+        """记录一次新的点赞：写入点赞记录并累加点赞数，调用方负责去重"""
+        self._likes.append({'user_id': user_id, 'script_id': script_id, 'created_at': datetime.now()})
+        await self.add(script_id, 'like_count')
+
+    def pending_likes(self, user_id: int) -> List[int]:
+        """返回该用户尚未写入数据库的点赞话术ID"""
+        return [row['script_id'] for row in self._flushing_likes + self._likes if row['user_id'] == user_id]
+
+    def pending(self, script_id: int, field: str) -> int:
+        """返回该话术尚未写入数据库的计数增量"""
+        return (
+            self._deltas.get(script_id, {}).get(field, 0)
+            + self._flushing.get(script_id, {}).get(field, 0)
+        )
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    async def flush(self):
+        """把当前累积的点赞记录和增量在一个事务中批量写入数据库"""
+        if not self._deltas or self._busy:
+            return
+        self._busy = True
+        self._flushing, self._deltas = self._deltas, {}
+        self._flushing_likes, self._likes = self._likes, []
+        rows = [
+            {'b_id': script_id, **{f'b_{field}': counters.get(field, 0) for field in COUNTER_FIELDS}}
+            for script_id, counters in self._flushing.items()
+        ]
+        statement = (
+            update(scripts_table)
+            .where(scripts_table.c.id == bindparam('b_id'))
+            .values({field: scripts_table.c[field] + bindparam(f'b_{field}') for field in COUNTER_FIELDS})
+        )
+        try:
+            async with async_engine.begin() as conn:
+                if self._flushing_likes:
+                    # 多进程部署时其他进程可能已写入同一条点赞，忽略主键冲突
+                    await conn.execute(
+                        insert(script_likes_table)
+                        .prefix_with("OR IGNORE", dialect="sqlite")
+                        .prefix_with("IGNORE", dialect="mysql"),
+                        self._flushing_likes
+                    )
+                await conn.execute(statement, rows)
+            self.flushed += len(rows)
+            self.batches += 1
+            for callback in _listeners:
+                callback(self._flushing)
+        except Exception as e:
+            # 写入失败时把增量放回，下次再写
+            self.failed += 1
+            for script_id, counters in self._flushing.items():
+                merged = self._deltas.setdefault(script_id, {})
+                for field, delta in counters.items():
+                    merged[field] = merged.get(field, 0) + delta
+            self._likes[:0] = self._flushing_likes
+            print(f"话术计数批量写入失败，{len(rows)} 条话术的增量将在下次重试: {e}")
+        finally:
+            self._flushing = {}
+            self._flushing_likes = []
+            self._busy = False
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._deltas),
+            "pending_likes": len(self._likes),
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "failed": self.failed,
+        }
+
+
+script_counters = ScriptCounters(flush_interval=settings.SCRIPT_COUNTER_FLUSH_INTERVAL)
@@ -0,0 +1,89 @@
+"""
+话术点赞去重模块
+
+每个用户对每条话术只能点赞一次。用户的点赞集合以整数位图缓存在内存中，话术ID先映射为
+紧凑的槽位（第 slot 位为 1 表示已点赞），位图大小取决于被点赞过的话术数量而不是最大话术ID。
+重复点赞直接在内存中判定，不访问数据库；新的点赞交给 script_counters
+与点赞数增量一起批量写入 script_likes 表。
+
+主要内容：
+- ScriptLikeIndex: 按用户缓存点赞位图，LRU 淘汰 + 过期时间
+- script_likes: 全局实例
+
+说明：
+- 用户位图首次使用时从 script_likes 表加载，并合并尚未写入数据库的点赞
+- 槽位按话术首次出现在点赞中的顺序分配，只增不减：话术删除后若复用其槽位，
+  点赞过旧话术的用户会被误判为点赞了新话术
+"""
+
+from typing import Dict
+
+from sqlalchemy import select
+
+from config import get_settings
+from models.database import AsyncSessionLocal, ScriptLike
+from services.script_counters import script_counters
+from utils.cache import TTLCache
+
+settings = get_settings()
+
+
+class ScriptLikeIndex:
+    """
+    用户点赞位图
+
+    Args:
+        maxsize: 最多缓存的用户数
+        ttl: 用户位图的缓存时间（秒）
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 3600):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl, name='script_likes')
+        # script_id -> 位图中的槽位
+        self._slots: Dict[int, int] = {}
+
+    def _slot(self, script_id: int) -> int:
+        slot = self._slots.get(script_id)
+        if slot is None:
+            slot = self._slots[script_id] = len(self._slots)
+        return slot
+
+    async def _bits(self, user_id: int) -> int:
+        bits = self._cache.get(user_id)
+        if bits is not None:
+            return bits
+        async with AsyncSessionLocal() as db:
+            script_ids = (await db.scalars(select(ScriptLike.script_id).where(ScriptLike.user_id == user_id))).all()
+        # 加载期间其他请求可能已写入该用户的位图，以先写入的为准
+        bits = self._cache.peek(user_id)
+        if bits is not None:
+            return bits
+        bits = 0
+        for script_id in list(script_ids) + script_counters.pending_likes(user_id):
+            bits |= 1 << self._slot(script_id)
+        self._cache.set(user_id, bits)
+        return bits
+
+    async def has_liked(self, user_id: int, script_id: int) -> bool:
+        bits = await self._bits(user_id)
+        # 没有槽位说明已加载的点赞中都没有这条话术，不为它分配槽位
+        slot = self._slots.get(script_id)
+        return slot is not None and bool(bits >> slot & 1)
+
+    async def like(self, user_id: int, script_id: int) -> bool:
+        """
+        记录点赞
+
+        Returns:
+            bool: 是否为新的点赞，已点赞过时返回 False
+        """
+        bits = await self._bits(user_id)
+        slot = self._slot(script_id)
+        if bits >> slot & 1:
+            return False
+        self._cache.set(user_id, bits | 1 << slot)
+        await script_counters.add_like(user_id, script_id)
+        return True
+
+
+script_likes = ScriptLikeIndex(maxsize=settings.SCRIPT_LIKE_CACHE_SIZE, ttl=settings.SCRIPT_LIKE_CACHE_TTL)
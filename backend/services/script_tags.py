@@ -0,0 +1,112 @@
+"""
+话术标签同步模块
+
+把 Script.tags 中逗号分隔的标签拆分写入 tags / script_tags 表，按标签筛选时
+通过 script_tags 的 (tag_id, script_id) 索引查找，不再对 tags 列做 LIKE 扫描，
+也不会误匹配其他标签的子串。
+
+主要内容：
+- split_tags(): 拆分标签字符串
+- tag_condition(): 生成“话术带有指定标签之一”的筛选条件
+- sync_missing_script_tags() / rebuild_script_tags(): 补齐或重建关联数据
+
+说明：
+- 通过 ORM 新增、修改、删除话术时在同一事务内同步关联表
+- 通过 sqlite3 直接写库的脚本不会触发同步，应用启动时会补齐缺失的话术，
+  修改已有话术的标签后需执行 migrate_script_tags.py 重建
+"""
+
+from typing import Iterable, List, Optional
+
+from sqlalchemy import delete, event, inspect, insert, select
+from sqlalchemy.engine import Connection
+
+from models.database import Script, ScriptTag, Tag
+
+tags_table = Tag.__table__
+script_tags_table = ScriptTag.__table__
+
+
+def split_tags(tags: Optional[str]) -> List[str]:
+    """把逗号分隔的标签字符串拆分为去重后的标签列表，兼容中文逗号"""
+    if not tags:
+        return []
+    names = (tag.strip() for tag in tags.replace('，', ',').split(','))
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def tag_condition(tags: Iterable[str]):
+    """
+    生成“话术带有指定标签之一”的筛选条件
+
+    Args:
+        tags: 标签名称，按完整名称精确匹配
+
+    Returns:
+        SQLAlchemy 条件表达式，标签为空时返回 None
+    """
+    names = [name.strip() for name in tags if name and name.strip()]
+    if not names:
+        return None
+    script_ids = (
+        select(script_tags_table.c.script_id)
+        .join(tags_table, tags_table.c.id == script_tags_table.c.tag_id)
+        .where(tags_table.c.name.in_(names))
+    )
+    return Script.id.in_(script_ids)
+
+
+def _tag_ids(connection: Connection, names: List[str]) -> List[int]:
+    existing = dict(connection.execute(
+        select(tags_table.c.name, tags_table.c.id).where(tags_table.c.name.in_(names))
+    ).all())
+    for name in names:
+        if name not in existing:
+            result = connection.execute(insert(tags_table).values(name=name))
+            existing[name] = result.inserted_primary_key[0]
+    return [existing[name] for name in names]
+
+
+def sync_script_tags(connection: Connection, script_id: int, tags: Optional[str]):
+    """用话术当前的 tags 字段覆盖其在 script_tags 中的关联"""
+    connection.execute(delete(script_tags_table).where(script_tags_table.c.script_id == script_id))
+    names = split_tags(tags)
+    if names:
+        connection.execute(
+            insert(script_tags_table),
+            [{'script_id': script_id, 'tag_id': tag_id} for tag_id in _tag_ids(connection, names)]
+        )
+
+
+def sync_missing_script_tags(connection: Connection) -> int:
+    """为带标签但尚无关联记录的话术补齐 script_tags，返回处理的话术数量"""
+    rows = connection.execute(
+        select(Script.id, Script.tags)
+        .where(Script.tags.isnot(None), Script.tags != '')
+        .where(Script.id.notin_(select(script_tags_table.c.script_id)))
+    ).all()
+    for script_id, tags in rows:
+        sync_script_tags(connection, script_id, tags)
+    return len(rows)
+
+
+def rebuild_script_tags(connection: Connection) -> int:
+    """清空并按 scripts.tags 重建全部关联记录，返回处理的话术数量"""
+    connection.execute(delete(script_tags_table))
+    return sync_missing_script_tags(connection)
+
+
+@event.listens_for(Script, 'after_insert')
+def _after_insert(mapper, connection, target):
+    sync_script_tags(connection, target.id, target.tags)
+
+
+@event.listens_for(Script, 'after_update')
+def _after_update(mapper, connection, target):
+    if inspect(target).attrs.tags.history.has_changes():
+        sync_script_tags(connection, target.id, target.tags)
+
+
+@event.listens_for(Script, 'after_delete')
+def _after_delete(mapper, connection, target):
+    connection.execute(delete(script_tags_table).where(script_tags_table.c.script_id == target.id))
@@ -0,0 +1,120 @@
+"""
+话术变体同步模块
+
+语气只有 4 种、长度只有 3 种，把每条话术在各 (语气, 长度) 组合下的调整结果预先写入
+script_variants 表，调整话术接口按主键直接读取，不再查询话术并逐次做文本替换。
+
+主要内容：
+- VARIANT_TONES / VARIANT_LENGTHS: 生成变体的语气和长度，语气额外包含空字符串（不调整语气）
+- render_variants(): 生成一条话术的全部变体
+- sync_missing_script_variants() / rebuild_script_variants(): 补齐或重建变体数据
+- create_script_variant_triggers(): 创建 SQLite 触发器，绕过 ORM 修改话术内容时清除过期变体
+
+说明：
+- 通过 ORM 新增话术、修改 content / brief_content、删除话术时在同一事务内同步变体
+- 通过 sqlite3 直接写库的脚本不会触发同步：SQLite 上由 script_variant_triggers 触发器在话术内容
+  被修改或话术被删除时删除其变体，读取时退回现场调整，应用启动时补齐缺失的话术；
+  调整语气、长度规则后需执行 rebuild_script_variants.py 重建
+"""
+
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import delete, event, inspect, insert, select
+from sqlalchemy.engine import Connection
+
+from models.database import Script, ScriptVariant
+from services.ai_service_enhanced import EnhancedAIService
+
+script_variants_table = ScriptVariant.__table__
+
+VARIANT_TONES = ('',) + tuple(EnhancedAIService.TONE_ADJUSTMENTS)
+VARIANT_LENGTHS = tuple(EnhancedAIService.LENGTH_ADJUSTMENTS)
+
+# 只用于文本调整，不访问数据库
+_renderer = EnhancedAIService(None)
+
+
+def render_variants(script_id: int, content: str, brief_content: Optional[str]) -> List[dict]:
+    """生成一条话术在全部语气、长度组合下的变体记录"""
+    now = datetime.now()
+    rows = []
+    for length_type in VARIANT_LENGTHS:
+        original_content = brief_content if length_type == '简洁版' and brief_content else content
+        for tone in VARIANT_TONES:
+            rows.append({
+                'script_id': script_id,
+                'tone': tone,
+                'length_type': length_type,
+                'original_content': original_content,
+                'adjusted_content': _renderer.adjust_script_content(original_content, tone or None, length_type),
+                'updated_at': now,
+            })
+    return rows
+
+
+# 直接写库修改话术内容或删除话术时删除其变体，避免读到按旧内容生成的结果；
+# ORM 修改会在同一事务内随后重新生成（见 _after_update）
+SCRIPT_VARIANT_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS scripts_variants_au AFTER UPDATE OF content, brief_content ON scripts
+    WHEN old.content IS NOT new.content OR old.brief_content IS NOT new.brief_content
+    BEGIN
+        DELETE FROM script_variants WHERE script_id = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS scripts_variants_ad AFTER DELETE ON scripts BEGIN
+        DELETE FROM script_variants WHERE script_id = old.id;
+    END
+    """,
+]
+
+
+def create_script_variant_triggers(connection: Connection) -> bool:
+    """创建话术变体失效触发器（仅 SQLite，MySQL 的触发器见 database/init.sql），返回是否创建"""
+    if connection.dialect.name != 'sqlite':
+        return False
+    for ddl in SCRIPT_VARIANT_TRIGGERS:
+        connection.exec_driver_sql(ddl)
+    return True
+
+
+def sync_script_variants(connection: Connection, script_id: int, content: str, brief_content: Optional[str]):
+    """用话术当前内容覆盖其在 script_variants 中的全部变体"""
+    connection.execute(delete(script_variants_table).where(script_variants_table.c.script_id == script_id))
+    connection.execute(insert(script_variants_table), render_variants(script_id, content, brief_content))
+
+
+def sync_missing_script_variants(connection: Connection) -> int:
+    """为尚无变体记录的话术生成变体，返回处理的话术数量"""
+    rows = connection.execute(
+        select(Script.id, Script.content, Script.brief_content)
+        .where(Script.id.notin_(select(script_variants_table.c.script_id)))
+    ).all()
+    for script_id, content, brief_content in rows:
+        sync_script_variants(connection, script_id, content, brief_content)
+    return len(rows)
+
+
+def rebuild_script_variants(connection: Connection) -> int:
+    """清空并按话术当前内容重建全部变体，返回处理的话术数量"""
+    connection.execute(delete(script_variants_table))
+    return sync_missing_script_variants(connection)
+
+
+@event.listens_for(Script, 'after_insert')
+def _after_insert(mapper, connection, target):
+    sync_script_variants(connection, target.id, target.content, target.brief_content)
+
+
+@event.listens_for(Script, 'after_update')
+def _after_update(mapper, connection, target):
+    attrs = inspect(target).attrs
+    if attrs.content.history.has_changes() or attrs.brief_content.history.has_changes():
+        sync_script_variants(connection, target.id, target.content, target.brief_content)
+
+
+@event.listens_for(Script, 'after_delete')
+def _after_delete(mapper, connection, target):
+    connection.execute(delete(script_variants_table).where(script_variants_table.c.script_id == target.id))
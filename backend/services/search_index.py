@@ -0,0 +1,348 @@
+"""
+话术检索索引模块
+
+在进程内维护话术 title、content、tags、brief_content 四个字段的中文字符
+二元组（bigram）和三元组（trigram）倒排索引，用于替代逐个关键词
+LIKE '%kw%' 的全表扫描。
+
+主要内容：
+- ScriptSearchIndex: 倒排索引，按 n-gram 倒排表求交集定位单个关键词，多个关键词之间求并集；
+  同时维护字段长度等词项统计，提供按字段加权的 BM25 相关度打分
+- script_index: 全局索引实例，应用启动时从 Script 表构建，并随话术目录变更增量更新
+- init_script_fts() / drop_script_fts_if_unused(): 创建或删除 SQLite FTS5 全文检索表（可选后端，见 SCRIPT_SEARCH_BACKEND 配置）
+- keyword_filter(): 按配置的检索后端生成关键词过滤条件，后端不可用时退回 LIKE 查询
+- script_rank_keys() / rank_script_ids(): 按 BM25 相关度与使用次数的加权分对候选话术排序
+
+说明：
+- 文本统一转为小写后建立索引，与 LIKE 对 ASCII 大小写不敏感的行为保持一致
+- 通过 sqlite3 直接写库的脚本（如 supplement_knowledge_base*.py）不会触发增量更新，
+  导入后需要重启服务以重建索引
+"""
+
+import math
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import or_, select, table, column, literal_column
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from config import get_settings
+from models.database import Script
+from models.script_fts import SCRIPT_FTS_TABLE, SCRIPT_FTS_COLUMNS, create_script_fts, drop_script_fts
+from services.catalog import on_script_change
+
+settings = get_settings()
+
+# 参与检索的字段
+SEARCH_FIELDS = ('title', 'content', 'tags', 'brief_content')
+
+# BM25 参数及各字段权重：标题、标签命中比正文命中更能说明相关性
+BM25_K1 = 1.2
+BM25_B = 0.75
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'tags': 2.0,
+    'brief_content': 1.5,
+    'content': 1.0,
+}
+
+
+def _ngrams(text: str, n: int) -> Set[str]:
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class ScriptSearchIndex:
+    """话术 n-gram 倒排索引"""
+
+    def __init__(self, fields: Iterable[str] = SEARCH_FIELDS):
+        self.fields = tuple(fields)
+        self.ready = False
+        self._lock = threading.RLock()
+        # script_id -> {字段名: 小写文本}
+        self._docs: Dict[int, Dict[str, str]] = {}
+        # 字段名 -> {n-gram: script_id 集合}
+        self._postings: Dict[str, Dict[str, Set[int]]] = {f: {} for f in self.fields}
+        # 字段名 -> 全部话术该字段长度之和，用于计算平均字段长度
+        self._total_lengths: Dict[str, int] = {f: 0 for f in self.fields}
+        # (关键词, 字段) -> 文档频率，索引变更时清空
+        self._df_cache: Dict[Tuple[str, Tuple[str, ...]], int] = {}
+
+    def build(self, db: Session) -> int:
+        """从 Script 表全量构建索引，返回索引的话术数量"""
+        rows = db.query(Script.id, *[getattr(Script, f) for f in self.fields]).all()
+        with self._lock:
+            self._docs = {}
+            self._postings = {f: {} for f in self.fields}
+            self._total_lengths = {f: 0 for f in self.fields}
+            self._df_cache = {}
+            for row in rows:
+                self._add(row[0], dict(zip(self.fields, row[1:])))
+            self.ready = True
+        return len(rows)
+
+    def add(self, script_id: int, values: Dict[str, Optional[str]]):
+        """新增或替换一条话术的索引"""
+        with self._lock:
+            self._remove(script_id)
+            self._add(script_id, values)
+
+    def remove(self, script_id: int):
+        with self._lock:
+            self._remove(script_id)
+
+    def _add(self, script_id: int, values: Dict[str, Optional[str]]):
+        doc = {f: (values.get(f) or '').lower() for f in self.fields}
+        self._docs[script_id] = doc
+        self._df_cache.clear()
+        for field, text in doc.items():
+            self._total_lengths[field] += len(text)
+            postings = self._postings[field]
+            for n in (2, 3):
+                for gram in _ngrams(text, n):
+                    postings.setdefault(gram, set()).add(script_id)
+
+    def _remove(self, script_id: int):
+        doc = self._docs.pop(script_id, None)
+        if doc is None:
+            return
+        self._df_cache.clear()
+        for field, text in doc.items():
+            self._total_lengths[field] -= len(text)
+            postings = self._postings[field]
+            for n in (2, 3):
+                for gram in _ngrams(text, n):
+                    ids = postings.get(gram)
+                    if ids is not None:
+                        ids.discard(script_id)
+                        if not ids:
+                            del postings[gram]
+
+    def lookup(self, keyword: str, fields: Iterable[str] = None) -> Set[int]:
+        """
+        查找任一字段包含关键词的话术ID
+
+        关键词长度为2时直接取 bigram 倒排表；更长时对所有 trigram 倒排表
+        求交集（从最短的倒排表开始），再对候选集做子串校验排除误命中。
+        """
+        kw = keyword.lower()
+        fields = tuple(fields or self.fields)
+        result: Set[int] = set()
+        if not kw:
+            return result
+
+        with self._lock:
+            for field in fields:
+                if len(kw) < 2:
+                    result.update(sid for sid, doc in self._docs.items() if kw in doc[field])
+                    continue
+
+                postings = self._postings[field]
+                n = 3 if len(kw) >= 3 else 2
+                lists = sorted(
+                    (postings.get(gram, set()) for gram in _ngrams(kw, n)),
+                    key=len
+                )
+                candidates = set(lists[0])
+                for ids in lists[1:]:
+                    if not candidates:
+                        break
+                    candidates &= ids
+
+                if len(kw) > n:
+                    candidates = {sid for sid in candidates if kw in self._docs[sid][field]}
+                result |= candidates
+
+        return result
+
+    def search(self, keywords: Iterable[str], fields: Iterable[str] = None) -> Set[int]:
+        """查找命中任一关键词的话术ID（各关键词结果求并集）"""
+        result: Set[int] = set()
+        for kw in keywords:
+            result |= self.lookup(kw, fields)
+        return result
+
+    def scores(self, script_ids: Iterable[int], keywords: Sequence[str], fields: Iterable[str] = None) -> Dict[int, float]:
+        """
+        计算候选话术的 BM25F 相关度
+
+        词频为关键词在字段中的出现次数，按字段权重和字段长度归一化后
+        合并，再乘以关键词的逆文档频率。不在索引中的话术得分为0。
+        """
+        fields = tuple(fields or self.fields)
+        keywords = list(dict.fromkeys(kw.lower() for kw in keywords if kw))
+        result: Dict[int, float] = {}
+
+        with self._lock:
+            total = len(self._docs)
+            if not total or not keywords:
+                return {sid: 0.0 for sid in script_ids}
+
+            avg_lengths = {f: (self._total_lengths[f] / total) or 1.0 for f in fields}
+            idfs = {}
+            for kw in keywords:
+                df = self._df_cache.get((kw, fields))
+                if df is None:
+                    df = self._df_cache[(kw, fields)] = len(self.lookup(kw, fields))
+                idfs[kw] = math.log(1 + (total - df + 0.5) / (df + 0.5))
+
+            for sid in script_ids:
+                doc = self._docs.get(sid)
+                score = 0.0
+                if doc is not None:
+                    for kw in keywords:
+                        tf = 0.0
+                        for field in fields:
+                            count = doc[field].count(kw)
+                            if count:
+                                norm = 1 - BM25_B + BM25_B * len(doc[field]) / avg_lengths[field]
+                                tf += FIELD_WEIGHTS.get(field, 1.0) * count / norm
+                        if tf:
+                            score += idfs[kw] * tf * (BM25_K1 + 1) / (tf + BM25_K1)
+                result[sid] = score
+
+        return result
+
+
+script_index = ScriptSearchIndex()
+
+
+def script_rank_keys(
+    rows: Iterable[Tuple[int, Optional[int]]],
+    keywords: Sequence[str],
+    fields: Iterable[str] = SEARCH_FIELDS
+) -> List[Tuple[float, int, int]]:
+    """
+    计算候选话术的排序键并按降序排列
+
+    rows 为 (话术ID, 使用次数) 序列。排序键为 (综合得分, 使用次数, -话术ID)，
+    综合得分 = BM25 相关度 + SEARCH_USAGE_WEIGHT * ln(1 + 使用次数)，
+    即得分相同时按使用次数降序、ID 升序。排序键可直接用作分页游标。
+    """
+    rows = [(sid, usage or 0) for sid, usage in rows]
+    relevance = script_index.scores([sid for sid, _ in rows], keywords, fields)
+    weight = settings.SEARCH_USAGE_WEIGHT
+    keys = [(relevance[sid] + weight * math.log1p(usage), usage, -sid) for sid, usage in rows]
+    keys.sort(reverse=True)
+    return keys
+
+
+def rank_script_ids(
+    rows: Iterable[Tuple[int, Optional[int]]],
+    keywords: Sequence[str],
+    fields: Iterable[str] = SEARCH_FIELDS
+) -> List[int]:
+    """对候选话术排序，返回排序后的话术ID列表，排序规则见 script_rank_keys()"""
+    return [-key[2] for key in script_rank_keys(rows, keywords, fields)]
+
+
+_fts_ready = False
+_scripts_fts = table(SCRIPT_FTS_TABLE, column('rowid'), *[column(c) for c in SCRIPT_FTS_COLUMNS])
+
+
+def init_script_fts(engine) -> bool:
+    """
+    创建 FTS5 全文检索表及同步触发器（仅 SQLite）
+
+    表已存在时只补齐触发器；首次创建时从 scripts 表重建索引。
+    当前 SQLite 不支持 FTS5 或 trigram 分词器时返回 False，检索退回内存索引。
+    """
+    global _fts_ready
+    if engine.dialect.name != 'sqlite':
+        return False
+
+    try:
+        with engine.begin() as conn:
+            exists = conn.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE name = ?", (SCRIPT_FTS_TABLE,)
+            ).first() is not None
+            create_script_fts(conn.exec_driver_sql, exists)
+    except OperationalError as e:
+        print(f"FTS5 全文检索不可用，退回内存索引: {e}")
+        return False
+
+    _fts_ready = True
+    return True
+
+
+def drop_script_fts_if_unused(engine) -> bool:
+    """
+    删除不再使用的 FTS5 全文检索表及触发器（仅 SQLite）
+
+    检索后端不是 fts5 时，scripts_fts 的触发器仍会让每次写 scripts 都同步维护全文索引。
+    返回是否删除了全文检索表。
+    """
+    if engine.dialect.name != 'sqlite':
+        return False
+    with engine.begin() as conn:
+        exists = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE name = ?", (SCRIPT_FTS_TABLE,)
+        ).first() is not None
+        if exists:
+            drop_script_fts(conn.exec_driver_sql)
+    return exists
+
+
+def _fts_condition(keywords: List[str], fields: Iterable[str]):
+    match_columns = ' '.join(fields)
+    matches = []
+    for kw in keywords:
+        phrase = '"' + kw.replace('"', '""') + '"'
+        matches.append(literal_column(SCRIPT_FTS_TABLE).op('MATCH')(f'{{{match_columns}}} : {phrase}'))
+    return Script.id.in_(select(_scripts_fts.c.rowid).where(or_(*matches)))
+
+
+def keyword_filter(keywords: List[str], fields: Iterable[str] = SEARCH_FIELDS):
+    """
+    生成话术关键词过滤条件
+
+    命中任一关键词即满足条件。根据 SCRIPT_SEARCH_BACKEND 配置：
+    - fts5: 使用 scripts_fts 全文检索子查询；trigram 分词器无法为不足3个字符的关键词使用索引，
+      这些关键词（需求、客户等核心词大多是两个字）交给内存 bigram 索引
+    - memory: 使用内存倒排索引
+    - like: 逐字段 LIKE 匹配
+    全文检索不可用时退回内存索引，索引未构建时退回 LIKE 匹配。
+
+    Returns:
+        (condition, script_ids): 满足 SQL 条件或 ID 在集合中即为命中，没有有效关键词时均为 None。
+        内存索引命中不超过 SEARCH_ID_IN_LIMIT 条时转换为 Script.id IN (...) 并入 condition；
+        超过时以集合返回，由调用方在 Python 中过滤候选行——常见关键词在大目录下可命中数万条，
+        超出 SQLite 单条语句的绑定参数上限
+    """
+    keywords = [kw for kw in keywords if kw]
+    if not keywords:
+        return None, None
+
+    backend = settings.SCRIPT_SEARCH_BACKEND
+    conditions = []
+    script_ids = None
+    if backend == 'fts5' and _fts_ready:
+        long_keywords = [kw for kw in keywords if len(kw) >= 3]
+        if long_keywords:
+            conditions.append(_fts_condition(long_keywords, fields))
+        keywords = [kw for kw in keywords if len(kw) < 3]
+
+    if keywords:
+        if backend != 'like' and script_index.ready:
+            script_ids = script_index.search(keywords, fields)
+        else:
+            conditions.extend(
+                getattr(Script, field).like(f'%{kw}%')
+                for kw in keywords
+                for field in fields
+            )
+
+    if script_ids is not None and len(script_ids) <= settings.SEARCH_ID_IN_LIMIT:
+        conditions.append(Script.id.in_(sorted(script_ids)))
+        script_ids = None
+    return (or_(*conditions) if conditions else None), script_ids
+
+
+@on_script_change
+def _sync_index(action: str, script):
+    if not script_index.ready:
+        return
+    if action == 'delete':
+        script_index.remove(script.id)
+    else:
+        script_index.add(script.id, {f: getattr(script, f) for f in script_index.fields})
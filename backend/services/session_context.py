@@ -0,0 +1,79 @@
+"""
+会话上下文模块
+
+在进程内为每个会话保存最近 MAX_CONTEXT_TURNS 轮对话（用户消息 + AI回复），
+聊天接口从这里读取上下文，只有缓存中没有该会话时才查询数据库。
+
+主要内容：
+- SessionContextStore: 按 (用户ID, 会话ID) 保存环形缓冲区，LRU 淘汰 + 过期时间
+- session_context: 全局实例，对话记录的保存路径会同步追加到已缓存的会话
+
+说明：
+- 上下文条目为 dict：role、content、intent，以及AI回复记录在 context_data 中保存的 scene、position、keywords
+- 未缓存的会话追加时直接跳过，下次读取时从数据库（含尚未落库的记录）完整加载
+"""
+
+from collections import deque
+from typing import Callable, List, Optional
+
+from config import get_settings
+from utils.cache import TTLCache
+
+settings = get_settings()
+
+
+def context_entry(message_type: str, content: str, intent: Optional[str] = None, context_data: Optional[dict] = None) -> dict:
+    """把一条对话记录转换为上下文条目"""
+    context_data = context_data or {}
+    return {
+        'role': message_type,
+        'content': content,
+        'intent': intent,
+        'scene': context_data.get('scene'),
+        'position': context_data.get('position'),
+        'keywords': context_data.get('keywords'),
+    }
+
+
+class SessionContextStore:
+    """
+    会话上下文环形缓冲区
+
+    Args:
+        turns: 每个会话保留的对话轮数，一轮包含用户消息和AI回复两条记录
+        maxsize: 最多缓存的会话数
+        ttl: 会话多久没有新消息后过期（秒）
+    """
+
+    def __init__(self, turns: int = 10, maxsize: int = 10000, ttl: float = 1800):
+        self.maxlen = turns * 2
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl, name='session_context')
+
+    def get(self, user_id: int, session_id: str, loader: Callable[[int], List[dict]]) -> List[dict]:
+        """
+        获取会话上下文，按时间从早到晚排列
+
+        Args:
+            loader: 缓存未命中时调用，参数为需要的条目数，返回按时间从早到晚排列的上下文条目
+        """
+        key = (user_id, session_id)
+        buffer = self._cache.get(key)
+        if buffer is None:
+            buffer = deque(loader(self.maxlen), maxlen=self.maxlen)
+            self._cache.set(key, buffer)
+        return list(buffer)
+
+    def append(self, user_id: int, session_id: str, entry: dict):
+        """向已缓存的会话追加一条上下文并刷新过期时间"""
+        key = (user_id, session_id)
+        buffer = self._cache.peek(key)
+        if buffer is not None:
+            buffer.append(entry)
+            self._cache.set(key, buffer)
+
+
+session_context = SessionContextStore(
+    turns=settings.MAX_CONTEXT_TURNS,
+    maxsize=settings.SESSION_CONTEXT_SIZE,
+    ttl=settings.SESSION_CONTEXT_TTL
+)
@@ -0,0 +1,210 @@
+"""
+话术输入联想模块
+
+把启用话术的标题和标签（按逗号拆分）插入前缀树，每个节点缓存其子树中使用次数
+最高的前 K 个词条，查询时沿输入前缀下行到对应节点即可直接返回，不访问数据库。
+
+主要内容：
+- ScriptSuggester: 前缀树联想索引
+- script_suggester: 全局实例，应用启动时从 Script 表构建，并随话术目录变更增量更新
+
+说明：
+- 词条权重取包含该词条的话术中最大的 usage_count；仅使用次数变化不会触发目录变更，
+  由 script_counters 每次批量写入成功后把使用次数增量同步到前缀树
+"""
+
+import heapq
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from config import get_settings
+from models.database import Script
+from services.catalog import on_script_change
+from services.script_counters import on_counts_flushed
+from services.script_tags import split_tags
+
+settings = get_settings()
+
+# 词条标识：(类型, 小写文本)，类型为 title 或 tag
+TermKey = Tuple[str, str]
+
+
+class _Term:
+    __slots__ = ('kind', 'text', 'refs')
+
+    def __init__(self, kind: str, text: str):
+        self.kind = kind
+        self.text = text
+        # script_id -> usage_count
+        self.refs: Dict[int, int] = {}
+
+    def best(self) -> Tuple[int, int]:
+        """返回 (使用次数, 话术ID)，使用次数相同时取ID较小的话术"""
+        script_id = min(self.refs, key=lambda sid: (-self.refs[sid], sid))
+        return self.refs[script_id], script_id
+
+    def rank_key(self):
+        return (-self.best()[0], len(self.text), self.text)
+
+
+class _Node:
+    __slots__ = ('children', 'terms', 'top')
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.terms: Set[TermKey] = set()
+        # 子树内排名前 K 的词条，None 表示需要重新计算
+        self.top: Optional[List[TermKey]] = None
+
+
+class ScriptSuggester:
+    """
+    话术标题和标签的前缀树联想索引
+
+    Args:
+        top_k: 每个节点缓存的词条数量，也是单次查询可返回的最大数量
+    """
+
+    def __init__(self, top_k: int = 10):
+        self.top_k = top_k
+        self.ready = False
+        self._lock = threading.RLock()
+        self._root = _Node()
+        self._terms: Dict[TermKey, _Term] = {}
+        # script_id -> 该话术贡献的词条
+        self._script_terms: Dict[int, List[TermKey]] = {}
+
+    def build(self, db: Session) -> int:
+        """从 Script 表全量构建前缀树，返回收录的话术数量"""
+        rows = db.query(Script.id, Script.title, Script.tags, Script.usage_count).filter(Script.is_active == True).all()
+        with self._lock:
+            self._root = _Node()
+            self._terms = {}
+            self._script_terms = {}
+            for row in rows:
+                self._add(row.id, row.title, row.tags, row.usage_count)
+            self.ready = True
+        return len(rows)
+
+    def add(self, script_id: int, title: Optional[str], tags: Optional[str], usage_count: Optional[int]):
+        """新增或替换一条话术的词条"""
+        with self._lock:
+            self._remove(script_id)
+            self._add(script_id, title, tags, usage_count)
+
+    def remove(self, script_id: int):
+        with self._lock:
+            self._remove(script_id)
+
+    def _add(self, script_id: int, title: Optional[str], tags: Optional[str], usage_count: Optional[int]):
+        entries = [('title', title.strip())] if title and title.strip() else []
+        entries += [('tag', tag) for tag in split_tags(tags)]
+        keys = []
+        for kind, text in entries:
+            key = (kind, text.lower())
+            if key in keys:
+                continue
+            term = self._terms.get(key)
+            if term is None:
+                term = self._terms[key] = _Term(kind, text)
+                self._path(key[1], create=True)[-1].terms.add(key)
+            term.refs[script_id] = usage_count or 0
+            self._invalidate(key[1])
+            keys.append(key)
+        self._script_terms[script_id] = keys
+
+    def _remove(self, script_id: int):
+        for key in self._script_terms.pop(script_id, []):
+            term = self._terms[key]
+            term.refs.pop(script_id, None)
+            if not term.refs:
+                del self._terms[key]
+                self._path(key[1])[-1].terms.discard(key)
+            self._invalidate(key[1])
+
+    def add_usage(self, deltas: Dict[int, int]):
+        """累加话术的使用次数，只重新计算受影响词条路径上的缓存"""
+        with self._lock:
+            for script_id, delta in deltas.items():
+                for key in self._script_terms.get(script_id, ()):
+                    refs = self._terms[key].refs
+                    refs[script_id] += delta
+                    self._invalidate(key[1])
+
+    def _path(self, text: str, create: bool = False) -> List[_Node]:
+        """返回从根节点到 text 对应节点的路径，不存在且不创建时返回空列表"""
+        node = self._root
+        path = [node]
+        for ch in text:
+            child = node.children.get(ch)
+            if child is None:
+                if not create:
+                    return []
+                child = node.children[ch] = _Node()
+            node = child
+            path.append(node)
+        return path
+
+    def _invalidate(self, text: str):
+        # 词条变化只影响从根到该词条节点路径上各节点的缓存
+        for node in self._path(text):
+            node.top = None
+
+    def _top(self, node: _Node) -> List[TermKey]:
+        if node.top is None:
+            candidates = set(node.terms)
+            for child in node.children.values():
+                candidates.update(self._top(child))
+            node.top = heapq.nsmallest(self.top_k, candidates, key=lambda key: self._terms[key].rank_key())
+        return node.top
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[dict]:
+        """
+        返回以 prefix 开头的词条，按使用次数从高到低排序
+
+        Args:
+            prefix: 输入前缀，不区分大小写
+            limit: 返回数量，不超过 top_k
+
+        Returns:
+            List[dict]: 每项包含 text、kind（title/tag）、script_id、usage_count
+        """
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        with self._lock:
+            path = self._path(prefix)
+            if not path:
+                return []
+            result = []
+            for key in self._top(path[-1])[:limit]:
+                term = self._terms[key]
+                usage_count, script_id = term.best()
+                result.append({
+                    'text': term.text,
+                    'kind': term.kind,
+                    'script_id': script_id,
+                    'usage_count': usage_count,
+                })
+            return result
+
+
+script_suggester = ScriptSuggester(top_k=settings.SUGGEST_TOP_K)
+
+
+@on_script_change
+def _sync_suggester(action: str, script):
+    if not script_suggester.ready:
+        return
+    if action == 'delete' or not script.is_active:
+        script_suggester.remove(script.id)
+    else:
+        script_suggester.add(script.id, script.title, script.tags, script.usage_count)
+
+
+@on_counts_flushed
+def _sync_suggester_usage(deltas: Dict[int, Dict[str, int]]):
+    if script_suggester.ready:
+        script_suggester.add_usage({sid: d['usage_count'] for sid, d in deltas.items() if d.get('usage_count')})
@@ -0,0 +1,68 @@
+"""
+Aho-Corasick 多模式匹配工具
+
+将一组关键词编译成自动机，对文本只扫描一遍即可找出所有关键词的出现位置，
+耗时与文本长度和命中数量成正比，与关键词数量无关。
+"""
+
+from collections import deque
+from typing import Any, Iterable, Iterator, List, Tuple
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick 自动机
+
+    Args:
+        patterns: (关键词, 附加数据) 序列，同一关键词可以出现多次并携带不同的附加数据
+
+    Example:
+        matcher = AhoCorasick([('需求', 'scene'), ('需求变更', 'scene')])
+        for start, pattern, payload in matcher.iter_matches('客户提出需求变更'):
+            ...
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, Any]]):
+        self._goto: List[dict] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, Any]]] = [[]]
+
+        for pattern, payload in patterns:
+            if not pattern:
+                continue
+            node = 0
+            for ch in pattern:
+                child = self._goto[node].get(ch)
+                if child is None:
+                    child = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._goto[node][ch] = child
+                node = child
+            self._out[node].append((pattern, payload))
+
+        # 按层次遍历构建失败指针，并把失败指针所指节点的输出合并到当前节点
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, str, Any]]:
+        """
+        扫描文本，按结束位置顺序产出 (起始下标, 关键词, 附加数据)
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for pattern, payload in out[node]:
+                yield i - len(pattern) + 1, pattern, payload
@@ -1,18 +1,28 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Callable, Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
 from config import get_settings
-from models.database import get_db, User
+from models.database import AsyncSessionLocal, User
+from models.schemas import UserSnapshot
+from utils.cache import TTLCache
 
 settings = get_settings()
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
+# 令牌 -> 用户名，避免每次请求重复校验签名；缓存时间不超过令牌剩余有效期
+_token_cache = TTLCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL, name='auth_token')
+# 用户名 -> UserSnapshot，避免每次请求查询用户表
+_user_cache = TTLCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL, name='auth_user')
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
@@ -41,6 +51,87 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+class PasswordWorkerPool:
+    """
+    密码哈希线程池
+    
+    bcrypt 单次计算约 200ms，放在独立线程池中执行（bcrypt 计算期间释放 GIL），不阻塞事件循环。
+    执行中和排队的任务达到 max_pending 时直接拒绝，登录高峰不会无限堆积，也不会占满CPU影响聊天请求。
+    
+    Args:
+        workers: 线程数
+        max_pending: 执行中和排队任务数上限
+    """
+    
+    def __init__(self, workers: int = 2, max_pending: int = 32):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+    
+    async def run(self, func: Callable[..., Any], *args) -> Any:
+        """
+        在线程池中执行 func
+        
+        Raises:
+            HTTPException: 任务数已达上限时抛出503错误
+        """
+        if self.in_flight >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="登录请求过多，请稍后重试",
+                headers={"Retry-After": "1"},
+            )
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+    
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+    
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "running": min(self.in_flight, self.workers),
+            "queued": max(self.in_flight - self.workers, 0),
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+password_pool = PasswordWorkerPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING
+)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    在密码哈希线程池中验证密码，供异步路由使用
+    
+    Raises:
+        HTTPException: 线程池任务数已达上限时抛出503错误
+    """
+    return await password_pool.run(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    在密码哈希线程池中计算密码哈希，供异步路由使用
+    
+    Raises:
+        HTTPException: 线程池任务数已达上限时抛出503错误
+    """
+    return await password_pool.run(get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
     创建JWT访问令牌
@@ -72,31 +163,71 @@ def verify_token(token: str) -> Optional[str]:
     Returns:
         Optional[str]: 解析出的用户名，验证失败返回None
     """
+    username = _token_cache.get(token)
+    if username is not None:
+        return username
+    
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         username: str = payload.get("sub")
         if username is None:
             return None
+        expire = payload.get("exp")
+        ttl = settings.AUTH_CACHE_TTL if expire is None else min(settings.AUTH_CACHE_TTL, expire - time.time())
+        _token_cache.set(token, username, ttl=ttl)
         return username
     except JWTError:
         return None
 
 
+async def load_user_snapshot(username: str) -> Optional[UserSnapshot]:
+    """
+    获取用户快照，优先从认证缓存读取
+    
+    Args:
+        username: 用户名
+    
+    Returns:
+        Optional[UserSnapshot]: 用户快照，用户不存在返回None
+    """
+    snapshot = _user_cache.get(username)
+    if snapshot is not None:
+        return snapshot
+    async with AsyncSessionLocal() as db:
+        user = (await db.execute(select(User).where(User.username == username))).scalars().first()
+    if user is None:
+        return None
+    snapshot = UserSnapshot.model_validate(user)
+    _user_cache.set(username, snapshot)
+    return snapshot
+
+
+def invalidate_user(*usernames: str):
+    """
+    用户信息修改或账户被禁用后使其认证缓存失效，下次请求重新查询用户表
+    
+    Args:
+        usernames: 需要失效的用户名，修改用户名时应同时传入新旧用户名
+    """
+    for username in usernames:
+        _user_cache.pop(username)
+
+
 async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
+    token: str = Depends(oauth2_scheme)
+) -> UserSnapshot:
     """
     从JWT令牌中获取当前用户
     
     这是一个FastAPI依赖函数，用于在路由中自动获取当前登录用户。
+    令牌解析结果和用户快照都有缓存，命中时不查询数据库；
+    需要修改用户或读取完整用户信息的路由应按 id 另行加载 User。
     
     Args:
         token: JWT令牌，从Authorization头部自动提取
-        db: 数据库会话
     
     Returns:
-        User: 当前用户对象
+        UserSnapshot: 当前用户快照
     
     Raises:
         HTTPException: 令牌无效或用户不存在时抛出401错误
@@ -109,15 +240,15 @@ async def get_current_user(
     username = verify_token(token)
     if username is None:
         raise credentials_exception
-    user = db.query(User).filter(User.username == username).first()
+    user = await load_user_snapshot(username)
     if user is None:
         raise credentials_exception
     return user
 
 
 async def get_current_active_user(
-    current_user: User = Depends(get_current_user)
-) -> User:
+    current_user: UserSnapshot = Depends(get_current_user)
+) -> UserSnapshot:
     """
     获取当前激活的用户
     
@@ -128,7 +259,7 @@ async def get_current_active_user(
         current_user: 当前用户对象，从get_current_user依赖获取
     
     Returns:
-        User: 当前激活的用户对象
+        UserSnapshot: 当前激活的用户快照
     
     Raises:
         HTTPException: 用户被禁用时抛出400错误
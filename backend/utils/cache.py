@@ -0,0 +1,135 @@
+"""
+进程内缓存工具
+
+提供带容量上限和过期时间的 LRU 缓存，用于缓存查询总数、检索结果等读多写少、
+允许短时间不一致的数据。
+
+主要内容：
+- TTLCache: LRU + TTL 缓存，记录命中/未命中次数
+- VersionedCache: 绑定数据版本号的缓存，版本号变化时整体失效
+- cache_stats(): 汇总所有具名缓存的统计信息，用于监控接口
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+# 具名缓存注册表，名称 -> 缓存实例
+_registry: Dict[str, "TTLCache"] = {}
+
+
+class TTLCache:
+    """
+    LRU + TTL 缓存
+
+    超过 maxsize 时淘汰最久未使用的条目；条目写入超过 ttl 秒后视为过期。
+    线程安全。
+
+    Args:
+        maxsize: 最大条目数
+        ttl: 过期时间（秒）
+        name: 缓存名称，指定后会注册到 cache_stats() 的统计中
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60, name: Optional[str] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        if name:
+            _registry[name] = self
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] < time.monotonic():
+                del self._data[key]
+                item = None
+            if item is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._data.move_to_end(key)
+            return item[1]
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """读取未过期的条目，不计入命中统计，也不调整淘汰顺序"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                return default
+            return item[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.pop(key, None)
+            return default if item is None else item[1]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class VersionedCache(TTLCache):
+    """
+    绑定数据版本号的 LRU + TTL 缓存
+
+    每次读写前比较 version() 的返回值，版本号变化说明底层数据已更新，
+    此时清空全部条目。写入时可传入计算前取得的版本号，计算期间数据发生
+    变化时放弃写入，避免把旧数据缓存到新版本下。
+
+    Args:
+        version: 返回当前数据版本号的函数
+    """
+
+    def __init__(self, version: Callable[[], int], maxsize: int = 1024, ttl: float = 60, name: Optional[str] = None):
+        super().__init__(maxsize=maxsize, ttl=ttl, name=name)
+        self._version_source = version
+        self._version = version()
+
+    def _check_version(self):
+        version = self._version_source()
+        if version != self._version:
+            self.clear()
+            self._version = version
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        self._check_version()
+        return super().get(key, default)
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, version: Optional[int] = None):
+        self._check_version()
+        if version is not None and version != self._version:
+            return
+        super().set(key, value, ttl)
+
+    def stats(self) -> dict:
+        return {**super().stats(), "version": self._version}
+
+
+def cache_stats() -> Dict[str, dict]:
+    """汇总所有具名缓存的统计信息"""
+    return {name: cache.stats() for name, cache in _registry.items()}
@@ -0,0 +1,41 @@
+"""
+游标分页工具
+
+游标是对最后一条记录排序键的不透明编码（URL 安全的 base64 JSON），
+客户端只需原样回传，不应解析其内容。
+"""
+
+import base64
+import json
+from typing import Any, List
+
+
+def encode_cursor(kind: str, values: List[Any]) -> str:
+    """
+    生成游标
+
+    Args:
+        kind: 排序方式标识，用于拒绝在不同排序方式之间混用游标
+        values: 最后一条记录的排序键
+    """
+    raw = json.dumps({"k": kind, "v": values}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, kind: str) -> List[Any]:
+    """
+    解析游标，返回排序键
+
+    Raises:
+        ValueError: 游标格式错误或与当前排序方式不匹配
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        values = data["v"]
+        matched = data["k"] == kind and isinstance(values, list)
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("无效的分页游标")
+    if not matched:
+        raise ValueError("分页游标与当前查询不匹配")
+    return values
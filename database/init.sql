@@ -77,6 +77,42 @@ CREATE TABLE IF NOT EXISTS scripts (
     FULLTEXT idx_content (title, content)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='话术表';
 
+-- 标签表
+CREATE TABLE IF NOT EXISTS tags (
+    id INT AUTO_INCREMENT PRIMARY KEY COMMENT '标签ID',
+    name VARCHAR(50) NOT NULL COMMENT '标签名称',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    UNIQUE KEY uk_tag_name (name)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='标签表';
+
+-- 话术标签关联表（由 scripts.tags 拆分同步，应用启动时补齐缺失的关联）
+CREATE TABLE IF NOT EXISTS script_tags (
+    script_id BIGINT NOT NULL COMMENT '话术ID',
+    tag_id INT NOT NULL COMMENT '标签ID',
+    PRIMARY KEY (script_id, tag_id),
+    INDEX idx_tag_script (tag_id, script_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='话术标签关联表';
+
+-- 话术变体表（每条话术在各语气、长度下的调整结果，应用启动时补齐缺失的话术）
+CREATE TABLE IF NOT EXISTS script_variants (
+    script_id BIGINT NOT NULL COMMENT '话术ID',
+    tone VARCHAR(20) NOT NULL COMMENT '语气，空字符串表示不调整语气',
+    length_type VARCHAR(20) NOT NULL COMMENT '长度类型：简洁版、标准版、详细版',
+    original_content TEXT NOT NULL COMMENT '调整前的话术内容',
+    adjusted_content TEXT NOT NULL COMMENT '调整后的话术内容',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '生成时间',
+    PRIMARY KEY (script_id, tone, length_type)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='话术变体表';
+
+-- 直接写库修改话术内容或删除话术时删除其变体，应用读取时退回现场调整，启动时补齐
+CREATE TRIGGER scripts_variants_au AFTER UPDATE ON scripts FOR EACH ROW
+    DELETE FROM script_variants
+    WHERE script_id = OLD.id
+      AND (NOT (OLD.content <=> NEW.content) OR NOT (OLD.brief_content <=> NEW.brief_content));
+
+CREATE TRIGGER scripts_variants_ad AFTER DELETE ON scripts FOR EACH ROW
+    DELETE FROM script_variants WHERE script_id = OLD.id;
+
 -- 用户收藏表
 CREATE TABLE IF NOT EXISTS user_favorites (
     id BIGINT AUTO_INCREMENT PRIMARY KEY COMMENT '收藏ID',
@@ -89,6 +125,14 @@ CREATE TABLE IF NOT EXISTS user_favorites (
     INDEX idx_script_id (script_id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='用户收藏表';
 
+-- 话术点赞表
+CREATE TABLE IF NOT EXISTS script_likes (
+    user_id BIGINT NOT NULL COMMENT '用户ID',
+    script_id BIGINT NOT NULL COMMENT '话术ID',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '点赞时间',
+    PRIMARY KEY (user_id, script_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='话术点赞表';
+
 -- 对话记录表
 CREATE TABLE IF NOT EXISTS conversations (
     id BIGINT AUTO_INCREMENT PRIMARY KEY COMMENT '对话ID',
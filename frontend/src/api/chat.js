@@ -1,4 +1,5 @@
 import request from './request'
+import { useUserStore } from '@/stores/user'
 
 /**
  * 发送消息
@@ -13,6 +14,49 @@ export function sendMessage(data) {
   })
 }
 
+/**
+ * 以流式方式发送消息（Server-Sent Events）
+ * axios 无法逐段读取响应体，这里使用 fetch 读取事件流
+ * @param {Object} data - 消息数据
+ * @param {Function} onEvent - 事件回调，参数为 (事件名, 数据)
+ * @returns {Promise} - 事件流读取完毕后 resolve
+ */
+export async function sendMessageStream(data, onEvent) {
+  const userStore = useUserStore()
+  const response = await fetch('/api/chat/message/stream', {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      Authorization: `Bearer ${userStore.token}`
+    },
+    body: JSON.stringify(data)
+  })
+  if (!response.ok || !response.body) {
+    throw new Error(`请求失败: ${response.status}`)
+  }
+
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+    // 事件之间以空行分隔，最后一段可能不完整，留到下次拼接
+    const blocks = buffer.split('\n\n')
+    buffer = blocks.pop()
+    for (const block of blocks) {
+      let event = 'message'
+      let payload = ''
+      for (const line of block.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim()
+        else if (line.startsWith('data:')) payload += line.slice(5).trim()
+      }
+      if (payload) onEvent(event, JSON.parse(payload))
+    }
+  }
+}
+
 /**
  * 调整脚本
  * @param {Object} data - 调整数据
@@ -26,6 +70,19 @@ export function adjustScript(data) {
   })
 }
 
+/**
+ * 批量调整脚本
+ * @param {Object} data - 调整数据，包含 script_ids、tone、length_type
+ * @returns {Promise} - 请求结果，按 script_ids 顺序排列的调整结果
+ */
+export function adjustScripts(data) {
+  return request({
+    url: '/chat/adjust/batch',
+    method: 'post',
+    data
+  })
+}
+
 /**
  * 获取聊天历史
  * @param {string} sessionId - 会话ID
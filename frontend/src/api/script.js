@@ -13,6 +13,20 @@ export function getScripts(params) {
   })
 }
 
+/**
+ * 获取输入联想
+ * @param {string} q - 用户已输入的前缀
+ * @param {number} limit - 返回数量
+ * @returns {Promise} 返回联想词条列表
+ */
+export function suggestScripts(q, limit = 8) {
+  return request({
+    url: '/scripts/suggest',
+    method: 'get',
+    params: { q, limit }
+  })
+}
+
 /**
  * 获取脚本详情
  * @param {string|number} id - 脚本ID
@@ -64,11 +78,13 @@ export function removeFavorite(scriptId) {
 
 /**
  * 获取收藏列表
- * @returns {Promise} 返回收藏列表数据
+ * @param {Object} params - 查询参数（page_size, cursor, fields）
+ * @returns {Promise} 返回收藏列表和下一页游标
  */
-export function getFavorites() {
+export function getFavorites(params) {
   return request({
     url: '/scripts/favorites/list',
-    method: 'get'
+    method: 'get',
+    params
   })
 }